@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Compare separation inference backends on synthetic audio
+"""
+import argparse
+import time
+import torch
+from cloud_splitter.config import Config
+from cloud_splitter.processor import Processor, ModelRegistry
+
+def benchmark(config, seconds):
+    """Separate ``seconds`` of noise with every backend and report speed and drift"""
+    reference = None
+    for backend in ("eager", "torchscript"):
+        config.demucs.backend = backend
+        processor = Processor(config, registry=ModelRegistry())
+
+        start = time.perf_counter()
+        model = processor._load_model()
+        load_time = time.perf_counter() - start
+
+        torch.manual_seed(0)
+        wav = torch.randn(model.audio_channels, int(seconds * model.samplerate)) * 0.1
+
+        start = time.perf_counter()
+        with torch.no_grad():
+            separated = processor._separate_tracks(model, [wav])[0]
+        elapsed = time.perf_counter() - start
+
+        if reference is None:
+            reference = separated
+            difference = 0.0
+        else:
+            difference = max(
+                (separated[stem] - reference[stem]).abs().max().item()
+                for stem in reference
+            )
+        print(
+            f"{backend:<12} load {load_time:6.1f}s  separate {elapsed:6.1f}s  "
+            f"RTF {elapsed / seconds:5.2f}  max diff vs eager {difference:.2e}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="htdemucs")
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--shifts", type=int, default=0)
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = default)")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    config = Config()
+    config.demucs.model = args.model
+    config.demucs.cpu_only = True
+    config.demucs.shifts = args.shifts
+    benchmark(config, args.seconds)
+
+if __name__ == "__main__":
+    main()
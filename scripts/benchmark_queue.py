@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Measure ProcessingQueue cost per operation as the queue grows
+"""
+import argparse
+import asyncio
+import logging
+import time
+from cloud_splitter.utils.queue import ProcessingQueue
+
+async def run(size, policy):
+    """Queue ``size`` URLs, then drain them; returns microseconds per operation"""
+    queue = ProcessingQueue(policy)
+    urls = [f"https://www.youtube.com/watch?v={index}" for index in range(size)]
+
+    start = time.perf_counter()
+    for index, url in enumerate(urls):
+        await queue.add_item(url, {"duration": (index * 7919) % 3600})
+    add_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    while (item := await queue.get_next_item()) is not None:
+        await queue.update_progress(item.url, 50.0)
+        await queue.mark_complete(item.url)
+        queue.queue_status
+    drain_time = time.perf_counter() - start
+
+    return add_time / size * 1e6, drain_time / size * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--policy", default="fifo", choices=["fifo", "sjf", "priority"])
+    args = parser.parse_args()
+
+    # Per-item log lines would dominate the measurement
+    logging.getLogger("cloud_splitter").setLevel(logging.WARNING)
+    for size in args.sizes:
+        add_us, drain_us = asyncio.run(run(size, args.policy))
+        print(f"{size:>8} items  add {add_us:7.1f}us/item  get+progress+complete+status {drain_us:7.1f}us/item")
+
+if __name__ == "__main__":
+    main()
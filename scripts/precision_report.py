@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Report separation speed and quality loss of each precision against fp32
+"""
+import argparse
+import math
+import time
+import torch
+from cloud_splitter.config import Config
+from cloud_splitter.inference import Precision, signal_to_distortion
+from cloud_splitter.processor import Processor, ModelRegistry
+
+def synthetic_corpus(samplerate, channels, seconds):
+    """A few reproducible mixes: tones, a click track, noise and silence"""
+    torch.manual_seed(0)
+    t = torch.arange(int(seconds * samplerate)) / samplerate
+    tones = sum(torch.sin(2 * math.pi * f * t) for f in (110.0, 220.0, 440.0, 880.0)) / 4
+    clicks = (torch.remainder(t, 0.5) < 0.01).float() * torch.randn(t.shape[-1])
+    noise = torch.randn(t.shape[-1]) * 0.05
+    silence = torch.zeros(t.shape[-1])
+    corpus = {
+        "tones": tones,
+        "clicks": clicks,
+        "tones+clicks+noise": tones * 0.5 + clicks * 0.3 + noise,
+        "mostly silence": torch.where(t < seconds / 4, tones, silence),
+    }
+    return {name: (wav * 0.3).expand(channels, -1).clone() for name, wav in corpus.items()}
+
+def report(config, seconds):
+    reference = {}
+    rows = []
+    for precision in Precision:
+        config.demucs.precision = precision.value
+        processor = Processor(config, registry=ModelRegistry())
+        model = processor._load_model()
+        corpus = synthetic_corpus(model.samplerate, model.audio_channels, seconds)
+
+        start = time.perf_counter()
+        with torch.no_grad():
+            separated = processor._separate_tracks(model, list(corpus.values()))
+        elapsed = time.perf_counter() - start
+
+        for name, sources in zip(corpus, separated):
+            if precision == Precision.FP32:
+                reference[name] = sources
+            sdr = min(
+                signal_to_distortion(reference[name][stem], sources[stem])
+                for stem in sources
+            )
+            rows.append((precision.value, name, elapsed / (seconds * len(corpus)), sdr))
+
+    print("| precision | clip | RTF | worst-stem SDR vs fp32 (dB) |")
+    print("|---|---|---|---|")
+    for precision, name, rtf, sdr in rows:
+        print(f"| {precision} | {name} | {rtf:.2f} | {sdr:.1f} |")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="htdemucs")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = default)")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    config = Config()
+    config.demucs.model = args.model
+    config.demucs.cpu_only = True
+    config.demucs.shifts = 0
+    report(config, args.seconds)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,12 @@
+import asyncio
 import click
 from pathlib import Path
 from typing import List, Optional
-from cloud_splitter.tui.app import CloudSplitterApp
 from cloud_splitter.config import Config
+from cloud_splitter.core.config_loader import ConfigLoader
+from cloud_splitter.core.processor_factory import ProcessorFactory
+from cloud_splitter.core.warmup import ModelWarmup
+from cloud_splitter.core.workflow import ProcessingWorkflow
 from cloud_splitter.utils.logging import setup_logging, get_logger
 from cloud_splitter.exceptions import CloudSplitterError
 
@@ -24,6 +28,8 @@ def cli(debug: bool, config: Optional[str]):
 @cli.command()
 def tui():
     """Launch the TUI application"""
+    # Imported here so the other commands work without loading the TUI
+    from cloud_splitter.tui.app import CloudSplitterApp
     try:
         logger.info("Starting TUI application")
         app = CloudSplitterApp()
@@ -32,6 +38,18 @@ def tui():
         logger.error(f"TUI application error: {str(e)}", exc_info=True)
         raise click.ClickException(str(e))
 
+@cli.command()
+def warmup():
+    """Fetch and warm the separation model, e.g. before a service starts"""
+    processor = ProcessorFactory.create_processor(ConfigLoader.load_or_default())
+    try:
+        model_warmup = ModelWarmup(processor)
+        if not model_warmup.run():
+            raise click.ClickException(f"Model warm-up failed: {model_warmup.error}")
+        click.echo(f"Separation model {processor.config.demucs.model} ready")
+    finally:
+        processor.close()
+
 @cli.command()
 @click.argument('urls', nargs=-1, required=True)
 @click.option('--output', '-o', type=click.Path(), help='Output directory')
@@ -40,12 +58,22 @@ def process(urls: List[str], output: Optional[str], keep: bool):
     """Process URLs directly from command line"""
     try:
         logger.info(f"Processing {len(urls)} URLs")
+        config = ConfigLoader.load_or_default()
+        config.download.keep_original = keep
+        # Only the given URLs, not items left in the queue by earlier runs
+        config.processing.persistent_queue = False
         if output:
             output_path = Path(output)
             logger.info(f"Using custom output directory: {output_path}")
-        
-        # TODO: Implement direct processing
-        logger.info("Direct processing not yet implemented")
+            config.paths.output_dir = output_path
+
+        workflow = ProcessingWorkflow(config)
+        try:
+            results = asyncio.run(_process_urls(workflow, list(urls)))
+        finally:
+            # Stops separation worker processes and flushes the queue database
+            workflow.close()
+        click.echo(f"Processed {len(results)} tracks")
         
     except CloudSplitterError as e:
         logger.error(f"Processing error: {str(e)}")
@@ -54,6 +82,10 @@ def process(urls: List[str], output: Optional[str], keep: bool):
         logger.error(f"Unexpected error: {str(e)}", exc_info=True)
         raise click.ClickException(str(e))
 
+async def _process_urls(workflow: ProcessingWorkflow, urls: List[str]):
+    await workflow.add_urls(urls)
+    return await workflow.process_queue()
+
 def main():
     try:
         cli()
@@ -5,21 +5,64 @@ from pydantic import BaseModel, Field
 class PathConfig(BaseModel):
     download_dir: Path = Field(default=Path.home() / "Downloads" / "cloud-splitter")
     output_dir: Path = Field(default=Path.home() / "Music" / "stems")
+    cache_dir: Path = Field(default=Path.home() / ".cache" / "cloud-splitter")
 
 class DownloadConfig(BaseModel):
     format: str = "bestaudio/best"
+    # Codec the download is converted to, or "native" to keep the stream as is
+    audio_format: str = "wav"
     keep_original: bool = True
     batch_enabled: bool = True
+    # Downloads run at once in batches and the queue
+    concurrent_downloads: int = 4
+    # Queue each playlist or channel entry as its own item
+    expand_playlists: bool = True
+    # Concurrent metadata probes of queued URLs for non-FIFO scheduling
+    prefetch_workers: int = 8
 
 class ProcessingConfig(BaseModel):
     separator: str = "demucs"
     stems: List[str] = ["vocals", "drums", "bass", "other"]
     custom_labels: Dict[str, str] = {}
+    progress_interval: float = 0.5
+    preview: bool = False
+    preview_duration: float = 30.0
+    output_format: str = "wav"
+    encode_workers: int = 2
+    mp3_bitrate: int = 320
+    opus_bitrate: int = 160
+    # Queue workers beyond the separation slots, i.e. downloads run ahead
+    pipeline_buffer: int = 2
+    # Waiting downloads a queue worker separates together in one batch
+    batch_tracks: int = 1
+    # Queue order: fifo, sjf (shortest first) or priority
+    schedule: str = "fifo"
+    # Priority gained per minute waited under the priority schedule
+    priority_aging: float = 1.0
+    # Keep the queue in cache_dir/queue.sqlite3 so it survives restarts
+    persistent_queue: bool = True
+    queue_flush_interval: float = 1.0
 
 class DemucsConfig(BaseModel):
     model: str = "htdemucs"
     cpu_only: bool = False
     shifts: int = 2
+    max_loaded_models: int = 1
+    batch_size: int = 8
+    overlap: float = 0.25
+    # Separate inputs longer than stream_threshold seconds window by window
+    streaming: bool = True
+    stream_threshold: float = 900.0
+    stream_window: float = 60.0
+    stream_overlap: float = 2.0
+    workers: int = 0
+    threads_per_worker: int = 0
+    backend: str = "eager"
+    precision: str = "fp32"
+    # Don't run the model on segments quieter than silence_threshold dBFS
+    skip_silence: bool = False
+    silence_threshold: float = -60.0
+    warmup: bool = True
 
 class SpleeterConfig(BaseModel):
     stems: int = 4
@@ -35,6 +78,19 @@ class MetadataConfig(BaseModel):
     apply_to_stems: bool = True
 
 
+class CacheConfig(BaseModel):
+    enabled: bool = True
+    separation_max_size: int = 20 * 1024**3
+    # Seconds before an abandoned separation checkpoint is deleted
+    checkpoint_max_age: float = 7 * 24 * 3600
+    # Decode each input once to memory-mapped float32 PCM shared by all stages
+    decoded_audio: bool = True
+    decoded_max_size: int = 10 * 1024**3
+    # Downloaded media under download_dir/.media-cache, keyed by video ID
+    media: bool = True
+    media_max_size: int = 20 * 1024**3
+
+
 class Config(BaseModel):
     paths: PathConfig = PathConfig()
     download: DownloadConfig = DownloadConfig()
@@ -43,6 +99,7 @@ class Config(BaseModel):
     spleeter: SpleeterConfig = SpleeterConfig()
     tui: TUIConfig = TUIConfig()
     metadata: MetadataConfig = MetadataConfig()
+    cache: CacheConfig = CacheConfig()
 
     @classmethod
     def load(cls, config_path: Optional[Path] = None) -> 'Config':
@@ -5,5 +5,6 @@ Core processing and workflow management for Cloud Splitter
 from .workflow import ProcessingWorkflow
 from .processor_factory import ProcessorFactory
 from .config_loader import ConfigLoader
+from .warmup import ModelWarmup
 
-__all__ = ['ProcessingWorkflow', 'ProcessorFactory', 'ConfigLoader']
+__all__ = ['ProcessingWorkflow', 'ProcessorFactory', 'ConfigLoader', 'ModelWarmup']
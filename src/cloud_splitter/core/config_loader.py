@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable
 import tomli
 import tomli_w
 from cloud_splitter.config import Config
@@ -34,6 +34,25 @@ class ConfigLoader:
             logger.error(f"Error loading configuration: {str(e)}")
             raise ConfigurationError(f"Failed to load configuration: {str(e)}")
 
+    @staticmethod
+    def load_or_default(
+        config_path: Optional[Path] = None,
+        on_error: Optional[Callable[[ConfigurationError], None]] = None
+    ) -> Config:
+        """Load configuration, falling back to the defaults if it can't be loaded.
+
+        A fresh install has no config file yet, which should not stop the
+        CLI, the TUI or the web service. ``on_error`` is called with the
+        error when the defaults are used.
+        """
+        try:
+            return ConfigLoader.load_config(config_path)
+        except ConfigurationError as e:
+            logger.warning(f"Using default configuration: {str(e)}")
+            if on_error is not None:
+                on_error(e)
+            return Config()
+
     @staticmethod
     def save_config(config: Config, config_path: Optional[Path] = None) -> None:
         """Save configuration to file"""
@@ -48,6 +67,7 @@ class ConfigLoader:
                 # Convert Path objects to strings
                 config_dict["paths"]["download_dir"] = str(config.paths.download_dir)
                 config_dict["paths"]["output_dir"] = str(config.paths.output_dir)
+                config_dict["paths"]["cache_dir"] = str(config.paths.cache_dir)
                 tomli_w.dump(config_dict, f)
             
             logger.info(f"Configuration saved to {config_path}")
@@ -1,6 +1,6 @@
 from typing import Optional
 from cloud_splitter.utils.logging import get_logger
-from cloud_splitter.processor import Processor, SeparatorType
+from cloud_splitter.processor import Processor, PooledProcessor, SeparatorType
 from cloud_splitter.config import Config
 
 logger = get_logger()
@@ -11,4 +11,7 @@ class ProcessorFactory:
     @staticmethod
     def create_processor(config: Config) -> Processor:
         """Create a processor based on configuration"""
+        if config.demucs.workers > 0:
+            logger.info(f"Using {config.demucs.workers} separation worker processes")
+            return PooledProcessor(config)
         return Processor(config)
@@ -0,0 +1,78 @@
+from typing import Any, Dict, Optional
+from enum import Enum
+import asyncio
+import time
+from cloud_splitter.processor import Processor
+from cloud_splitter.utils.logging import get_logger
+
+logger = get_logger()
+
+class WarmupState(str, Enum):
+    PENDING = "pending"
+    WARMING = "warming"
+    READY = "ready"
+    FAILED = "failed"
+    DISABLED = "disabled"
+
+class ModelWarmup:
+    """Startup hook that warms a processor and tracks readiness.
+
+    The CLI, the TUI and the web backend start one of these when they come
+    up and report themselves ready only once the model has been loaded and
+    has run a dummy inference. With ``demucs.warmup`` disabled the hook is
+    ready immediately and the first job pays the start-up cost instead.
+    """
+
+    def __init__(self, processor: Processor):
+        self.processor = processor
+        self.enabled = processor.config.demucs.warmup
+        self.state = WarmupState.PENDING if self.enabled else WarmupState.DISABLED
+        self.error: Optional[str] = None
+        self.seconds: Optional[float] = None
+        self._task: Optional[asyncio.Future] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state in (WarmupState.READY, WarmupState.DISABLED)
+
+    def run(self) -> bool:
+        """Warm the processor in this thread; returns whether it is ready"""
+        if not self.enabled:
+            return True
+
+        self.state = WarmupState.WARMING
+        logger.info(f"Warming up separation model {self.processor.config.demucs.model}")
+        start = time.monotonic()
+        try:
+            self.processor.warm_up()
+        except Exception as e:
+            self.state = WarmupState.FAILED
+            self.error = str(e)
+            logger.error(f"Model warm-up failed: {str(e)}")
+            return False
+
+        self.seconds = time.monotonic() - start
+        self.state = WarmupState.READY
+        logger.info(f"Separation model ready after {self.seconds:.1f}s")
+        return True
+
+    def start(self) -> asyncio.Future:
+        """Warm up in the default executor without blocking the event loop"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().run_in_executor(None, self.run)
+        return self._task
+
+    async def wait(self) -> bool:
+        """Wait for a warm-up started with ``start``; returns whether it is ready"""
+        if self._task is not None:
+            await self._task
+        return self.ready
+
+    @property
+    def status(self) -> Dict[str, Any]:
+        return {
+            "status": self.state.value,
+            "model": self.processor.config.demucs.model,
+            "seconds": self.seconds,
+            "error": self.error,
+        }
@@ -1,11 +1,16 @@
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Set, Callable, Tuple, Awaitable, Deque
+from collections import deque
 import asyncio
 from cloud_splitter.config import Config
-from cloud_splitter.downloader import Downloader
+from cloud_splitter.downloader import Downloader, DownloadResult
+from cloud_splitter.encoder import StemEncoder
+from cloud_splitter.processor import ProcessingResult
 from cloud_splitter.core.processor_factory import ProcessorFactory
-from cloud_splitter.utils.queue import ProcessingQueue, QueueItem
-from cloud_splitter.utils.status import StatusManager
+from cloud_splitter.core.warmup import ModelWarmup
+from cloud_splitter.utils.queue import ProcessingQueue, QueueItem, QueueStore, SchedulingPolicy
+from cloud_splitter.utils.status import SlotPool, StatusManager, format_eta, format_rate
+from cloud_splitter.utils.checkpoint import ResumeIndex
 from cloud_splitter.utils.logging import get_logger
 from cloud_splitter.exceptions import DownloadError, ProcessingError
 
@@ -18,67 +23,377 @@ class ProcessingWorkflow:
         self.config = config
         self.downloader = Downloader(config)
         self.processor = ProcessorFactory.create_processor(config)
-        self.queue = ProcessingQueue()
+        store = None
+        if config.processing.persistent_queue:
+            store = QueueStore(config.paths.cache_dir / "queue.sqlite3")
+        self.queue = ProcessingQueue(
+            config.processing.schedule,
+            config.processing.priority_aging,
+            store,
+            config.processing.queue_flush_interval
+        )
         self.status = StatusManager()
+        self.encoder = StemEncoder(config)
+        self.warmup = ModelWarmup(self.processor)
+        self.resume_index = ResumeIndex(config.paths.cache_dir / "resume.json")
+        self._progress_tasks: Set[asyncio.Task] = set()
+        self._prefetch_tasks: Set[asyncio.Task] = set()
+        self.workers = 0
+        # Metadata probes start as URLs are added, before the queue runs
+        self.slots: Dict[str, SlotPool] = {
+            "metadata": SlotPool(config.download.prefetch_workers),
+        }
+        # Downloads of queue workers waiting for a separation slot
+        self._separation_backlog: Deque[Tuple[str, DownloadResult, asyncio.Future]] = deque()
 
     async def process_url(self, url: str) -> Dict[str, Any]:
         """Process a single URL through the workflow"""
+        download_result, processing_result = await self._separate_url(url)
+        return await self._encode_url(url, download_result, processing_result)
+
+    async def _separate_url(self, url: str) -> Tuple[DownloadResult, ProcessingResult]:
+        """Download and separation stages for ``url``"""
+        download_result = await self._download_url(url)
+        processing_result = await self._separate_download(url, download_result)
+        return download_result, processing_result
+
+    async def _download_url(self, url: str) -> DownloadResult:
+        """Download stage, skipped when an earlier attempt left partial work"""
         try:
-            # Download stage
+            download_result = self._resumable_download(url)
+            if download_result is not None:
+                logger.info(f"Resuming {url} from {download_result.file_path}")
+                self.status.mark_complete("download", {"file_path": str(download_result.file_path), "resumed": True})
+                return download_result
+
             self.status.update_status("download", "starting", 0, f"Downloading {url}")
-            download_result = await self.downloader.download(url)
+            download_result = await self.downloader.download(url, progress=self._download_progress(url))
+            self.resume_index.put(url, download_result.model_dump(mode="json"))
             self.status.mark_complete("download", {"file_path": str(download_result.file_path)})
+            return download_result
+
+        except Exception as e:
+            logger.error(f"Error downloading {url}: {str(e)}")
+            self.status.mark_failed("download", str(e))
+            raise ProcessingError(f"Failed to process {url}: {str(e)}")
+
+    async def _separate_download(self, url: str, download_result: DownloadResult) -> ProcessingResult:
+        """Separation stage for the downloaded file of ``url``"""
+        try:
+            if self.config.processing.preview:
+                processing_result = await self._process_with_preview(url, download_result.file_path)
+            else:
+                self.status.update_status("processing", "starting", 0, "Separating stems")
+                processing_result = await self.processor.process_file(
+                    download_result.file_path,
+                    progress=self._separation_progress(url)
+                )
+            self._separated(url, download_result, processing_result)
+            return processing_result
             
-            # Processing stage
-            self.status.update_status("processing", "starting", 0, "Separating stems")
-            processing_result = await self.processor.process_file(download_result.file_path)
-            self.status.mark_complete("processing", {"stems": {k: str(v) for k, v in processing_result.stems.items()}})
-            
-            # Cleanup if needed
-            if not self.config.download.keep_original:
-                download_result.file_path.unlink()
-                logger.info(f"Removed original file: {download_result.file_path}")
-            
+        except Exception as e:
+            logger.error(f"Error processing {url}: {str(e)}")
+            self.status.mark_failed("processing", str(e))
+            raise ProcessingError(f"Failed to process {url}: {str(e)}")
+
+    async def _separate_batch(self, downloads: List[Tuple[str, DownloadResult]]) -> List[ProcessingResult]:
+        """Separation stage for several downloads in one ``process_batch`` call"""
+        urls = [url for url, _ in downloads]
+        try:
+            self.status.update_status("processing", "starting", 0, f"Separating stems of {len(downloads)} tracks")
+            reports = [self._separation_progress(url) for url in urls]
+
+            def progress(fraction: float) -> None:
+                for report in reports:
+                    report(fraction)
+
+            processing_results = await self.processor.process_batch(
+                [download_result.file_path for _, download_result in downloads],
+                progress=progress
+            )
+            for (url, download_result), processing_result in zip(downloads, processing_results):
+                self._separated(url, download_result, processing_result)
+            return processing_results
+
+        except Exception as e:
+            logger.error(f"Error processing {', '.join(urls)}: {str(e)}")
+            self.status.mark_failed("processing", str(e))
+            raise ProcessingError(f"Failed to process {len(urls)} tracks: {str(e)}")
+
+    def _separated(self, url: str, download_result: DownloadResult, processing_result: ProcessingResult) -> None:
+        """Record a finished separation and drop the download if it is not kept"""
+        self.status.mark_complete("processing", {
+            "stems": {k: str(v) for k, v in processing_result.stems.items()},
+            "skipped_seconds": processing_result.skipped_seconds
+        })
+
+        self.resume_index.discard(url)
+
+        # Cleanup if needed
+        if not self.config.download.keep_original:
+            download_result.file_path.unlink()
+            logger.info(f"Removed original file: {download_result.file_path}")
+
+    def _resumable_download(self, url: str) -> Optional[DownloadResult]:
+        """The earlier download of ``url`` if its separation never finished"""
+        entry = self.resume_index.get(url)
+        if entry is None:
+            return None
+        download_result = DownloadResult.model_validate(entry)
+        if not download_result.file_path.exists():
+            self.resume_index.discard(url)
+            return None
+        return download_result
+
+    async def _encode_url(
+        self,
+        url: str,
+        download_result: DownloadResult,
+        processing_result: ProcessingResult
+    ) -> Dict[str, Any]:
+        """Output encoding stage for ``url``"""
+        try:
+            if self.encoder.enabled:
+                self.status.update_status("encoding", "starting", 0, f"Encoding stems to {self.encoder.format.value}")
+                processing_result = await self.encoder.encode(processing_result)
+                self.status.mark_complete("encoding", {"stems": {k: str(v) for k, v in processing_result.stems.items()}})
+
             return {
                 "url": url,
                 "title": download_result.title,
                 "artist": download_result.artist,
                 "stems": processing_result.stems,
-                "output_dir": str(processing_result.output_dir)
+                "output_dir": str(processing_result.output_dir),
+                "skipped_seconds": processing_result.skipped_seconds
             }
-            
+
         except Exception as e:
-            logger.error(f"Error processing {url}: {str(e)}")
-            self.status.mark_failed("processing", str(e))
+            logger.error(f"Error encoding {url}: {str(e)}")
+            self.status.mark_failed("encoding", str(e))
             raise ProcessingError(f"Failed to process {url}: {str(e)}")
 
-    async def process_queue(self) -> List[Dict[str, Any]]:
-        """Process all URLs in the queue"""
+    async def _process_with_preview(self, url: str, file_path: Path):
+        """Separate a quick preview as its own stage, then the full track"""
+        self.status.update_status("preview", "starting", 0, "Separating preview")
+
+        def on_preview(preview) -> None:
+            self.status.mark_complete("preview", {"stems": {k: str(v) for k, v in preview.stems.items()}})
+            self.status.update_status("processing", "starting", 0, "Separating stems")
+
+        return await self.processor.process_progressive(
+            file_path,
+            on_preview,
+            progress=self._separation_progress(url)
+        )
+
+    def _download_progress(self, url: str) -> Callable[..., None]:
+        """Progress callback publishing download progress, speed and ETA for ``url``"""
+        def report(
+            fraction: float,
+            speed: Optional[float] = None,
+            eta: Optional[float] = None,
+            details: Optional[str] = None
+        ) -> None:
+            percent = fraction * 100
+            if speed:
+                details = f"{details} at {format_rate(speed)}, {format_eta(eta)} left"
+            self.status.update_progress("download", percent, details)
+            self._track(self.queue.update_progress(url, percent, speed=speed, eta=eta))
+        return report
+
+    def _track(self, update: Awaitable[None]) -> None:
+        task = asyncio.ensure_future(update)
+        self._progress_tasks.add(task)
+        task.add_done_callback(self._progress_tasks.discard)
+
+    def _separation_progress(self, url: str) -> Callable[[float], None]:
+        """Progress callback publishing separation progress for ``url``"""
+        def report(fraction: float) -> None:
+            percent = fraction * 100
+            self.status.update_progress("processing", percent)
+            self._track(self.queue.update_progress(url, percent))
+        return report
+
+    async def process_queue(self, concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Process all URLs in the queue with ``concurrency`` workers.
+
+        Each worker takes an item through download, separation and encoding.
+        Each step is gated by its own slot pool:
+        ``download.concurrent_downloads`` download slots, one separation
+        slot per file the processor can separate at a time, and
+        ``processing.encode_workers`` encode slots for encoding and
+        recording the result. Downloads and encoding therefore overlap with
+        separation. By default there are ``processing.pipeline_buffer``
+        more workers than separation slots, which bounds how far downloads
+        run ahead of the separators.
+        """
         results = []
+        # Jobs wait for the warm-up, joining one already started at launch
+        self.warmup.start()
+        await self.warmup.wait()
+
+        separators = self.processor.concurrency
+        if concurrency is None:
+            concurrency = separators + max(self.config.processing.pipeline_buffer, 0)
+        self.workers = max(concurrency, 1)
+        self.slots.update({
+            "download": SlotPool(self.config.download.concurrent_downloads),
+            "separation": SlotPool(separators),
+            "encode": SlotPool(self.config.processing.encode_workers),
+        })
+
+        await asyncio.gather(*(self._queue_worker(results) for _ in range(self.workers)))
+        await self.queue.flush()
+        logger.info("Queue finished: " + ", ".join(
+            f"{name} slots {stats['utilisation']:.0%} busy (peak {stats['peak']}/{stats['capacity']})"
+            for name, stats in self.worker_status["slots"].items()
+        ))
+        return results
+
+    async def _queue_worker(self, results: List[Dict[str, Any]]) -> None:
         while True:
             item = await self.queue.get_next_item()
             if not item:
                 break
-                
+
             try:
-                result = await self.process_url(item.url)
-                await self.queue.mark_complete(item.url, result)
-                results.append(result)
+                async with self.slots["download"]:
+                    download_result = await self._download_url(item.url)
+                processing_result = await self._separate_queued(item.url, download_result)
             except Exception as e:
                 await self.queue.mark_failed(item.url, str(e))
                 logger.error(f"Failed to process {item.url}: {str(e)}")
-        
-        return results
+                continue
 
-    async def add_urls(self, urls: List[str]) -> List[QueueItem]:
-        """Add URLs to the processing queue"""
-        return await self.queue.add_items(urls)
+            async with self.slots["encode"]:
+                await self._finish_item(item.url, download_result, processing_result, results)
+
+    async def _separate_queued(self, url: str, download_result: DownloadResult) -> ProcessingResult:
+        """Separation step of a queue worker.
+
+        Downloads wait in a backlog for a separation slot. The worker that
+        gets the slot separates up to ``processing.batch_tracks`` of them,
+        oldest first, as one batch whose segments share forward passes; the
+        workers of the other downloads in the batch just await their
+        results without taking a slot.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._separation_backlog.append((url, download_result, future))
+        while self._in_backlog(future):
+            async with self.slots["separation"]:
+                # Another worker may have taken this download into its batch
+                if self._in_backlog(future):
+                    await self._separate_backlog()
+        return await future
+
+    def _in_backlog(self, future: asyncio.Future) -> bool:
+        return any(queued is future for _, _, queued in self._separation_backlog)
+
+    async def _separate_backlog(self) -> None:
+        if not self._separation_backlog:
+            return
+        # Previews are published file by file, so they are never batched
+        limit = 1 if self.config.processing.preview else max(self.config.processing.batch_tracks, 1)
+        batch = [self._separation_backlog.popleft() for _ in range(min(limit, len(self._separation_backlog)))]
+        try:
+            if len(batch) == 1:
+                url, download_result, _ = batch[0]
+                processing_results = [await self._separate_download(url, download_result)]
+            else:
+                processing_results = await self._separate_batch([(url, download) for url, download, _ in batch])
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, _, future), processing_result in zip(batch, processing_results):
+            future.set_result(processing_result)
+
+    async def _finish_item(
+        self,
+        url: str,
+        download_result: DownloadResult,
+        processing_result: ProcessingResult,
+        results: List[Dict[str, Any]]
+    ) -> None:
+        try:
+            result = await self._encode_url(url, download_result, processing_result)
+            await self.queue.mark_complete(url, result)
+            results.append(result)
+        except Exception as e:
+            await self.queue.mark_failed(url, str(e))
+            logger.error(f"Failed to process {url}: {str(e)}")
+
+    def close(self) -> None:
+        """Release processor resources such as worker processes"""
+        self.processor.close()
+        self.encoder.close()
+        self.queue.close()
+
+    async def add_urls(self, urls: List[str], priority: float = 0.0) -> List[QueueItem]:
+        """Add URLs to the processing queue, one item per playlist or channel entry.
+
+        Every item gets ``priority``, which orders the queue under the
+        priority schedule.
+        """
+        if not self.config.download.expand_playlists:
+            items = await self.queue.add_items(urls, priority)
+            self._prefetch(items)
+            return items
+
+        expanded = await asyncio.gather(
+            *(self.downloader.expand(url) for url in urls),
+            return_exceptions=True
+        )
+        items = []
+        for url, entries in zip(urls, expanded):
+            if isinstance(entries, Exception):
+                # Queue the URL as it is; its download reports the error
+                logger.error(f"Could not expand {url}: {str(entries)}")
+                items.append(await self.queue.add_item(url, priority=priority))
+                continue
+            for entry in entries:
+                metadata = entry.model_dump(exclude={"url"}, exclude_none=True)
+                items.append(await self.queue.add_item(entry.url, metadata, priority))
+        self._prefetch(items)
+        return items
+
+    def _prefetch(self, items: List[QueueItem]) -> None:
+        """Probe durations and sizes in the background for shortest job first.
+
+        The other schedules never look at them, and playlist entries usually
+        come with a duration from the flat listing, so those are not probed.
+        """
+        if self.queue.policy != SchedulingPolicy.SJF:
+            return
+        for item in items:
+            if item.metadata.get("duration") is None:
+                task = asyncio.ensure_future(self._prefetch_item(item.url))
+                self._prefetch_tasks.add(task)
+                task.add_done_callback(self._prefetch_tasks.discard)
+
+    async def _prefetch_item(self, url: str) -> None:
+        try:
+            async with self.slots["metadata"]:
+                metadata = await self.downloader.probe(url)
+        except Exception as e:
+            logger.warning(f"Could not prefetch metadata for {url}: {str(e)}")
+            return
+        await self.queue.update_metadata(url, metadata)
 
     @property
     def queue_status(self) -> Dict[str, int]:
         """Get current queue status"""
         return self.queue.queue_status
 
+    @property
+    def worker_status(self) -> Dict[str, Any]:
+        """Queue depth, worker count and per-slot utilisation of the running queue"""
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue.queue_status["pending"],
+            "slots": {name: pool.stats for name, pool in self.slots.items()},
+        }
+
     @property
     def current_status(self) -> Dict[str, Any]:
         """Get current processing status"""
@@ -1,7 +1,23 @@
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Callable, Dict, List, Optional
+from functools import partial
+from urllib.parse import parse_qs, urlparse
+import asyncio
+import re
 import yt_dlp
 from pydantic import BaseModel
+from cloud_splitter.utils.cache import MediaCache, link_or_copy
+from cloud_splitter.utils.logging import get_logger
+from cloud_splitter.utils.status import ProgressThrottle
+
+logger = get_logger()
+
+# Called with the downloaded fraction plus ``speed`` (bytes/s), ``eta``
+# (seconds) and a human readable ``details`` keyword
+DownloadProgressCallback = Callable[..., None]
+
+# URL paths of playlists, channels and albums on the supported sites
+_COLLECTION_PATH = re.compile(r"/(playlist|channel|c|user|@[^/]+|sets|album)(/|$)")
 
 class DownloadResult(BaseModel):
     file_path: Path
@@ -9,44 +25,239 @@ class DownloadResult(BaseModel):
     artist: Optional[str]
     is_video: bool
 
+class BatchDownloadResult(BaseModel):
+    # Successful downloads, in the order their URLs were given
+    results: List[DownloadResult]
+    # Error message per URL that failed
+    failures: Dict[str, str] = {}
+
+class PlaylistEntry(BaseModel):
+    url: str
+    title: Optional[str] = None
+    # Title of the playlist or channel the entry was listed in
+    playlist: Optional[str] = None
+    # 1-based position within that playlist
+    index: Optional[int] = None
+    # Seconds, when the flat listing includes it
+    duration: Optional[float] = None
+
 class Downloader:
     def __init__(self, config):
         self.config = config
+        # Bounds concurrent downloads across every caller of this downloader
+        self._slots = asyncio.Semaphore(max(config.download.concurrent_downloads, 1))
+        # Metadata probes are cheap and get their own, wider bound
+        self._probe_slots = asyncio.Semaphore(max(config.download.prefetch_workers, 1))
+        self.media_cache = None
+        # Without keep_original the downloads are meant to go once separated,
+        # and a cached copy would keep them on disk
+        if config.cache.enabled and config.cache.media and config.download.keep_original:
+            self.media_cache = MediaCache(
+                config.paths.download_dir / ".media-cache",
+                config.cache.media_max_size
+            )
         self._setup_options()
 
     def _setup_options(self):
+        postprocessors = []
+        # "native" keeps the downloaded stream (opus, m4a) as it is; separation
+        # decodes it straight to PCM, so a WAV transcode would be wasted work
+        if self.config.download.audio_format != "native":
+            postprocessors.append({
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': self.config.download.audio_format,
+                'preferredquality': '192',
+            })
         self.ydl_opts = {
             'format': self.config.download.format,
             'outtmpl': '%(title)s.%(ext)s',
             'paths': {'home': str(self.config.paths.download_dir)},
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'wav',
-                'preferredquality': '192',
-            }],
+            'postprocessors': postprocessors,
             'extract_audio': True,
             'writethumbnail': True,
             'writeinfojson': True,
         }
 
-    async def download(self, url: str) -> DownloadResult:
+    def _extract_info(self, url: str, report: Optional[ProgressThrottle] = None) -> Dict[str, Any]:
+        # Runs in a worker thread; YoutubeDL instances are not shared between threads
+        opts = dict(self.ydl_opts)
+        if report is not None:
+            opts['progress_hooks'] = [partial(self._progress_hook, report)]
+            opts['postprocessor_hooks'] = [partial(self._postprocessor_hook, report)]
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            if self.media_cache is None:
+                return ydl.extract_info(url, download=True)
+
+            # Resolve the video ID first and download only on a cache miss
+            info = ydl.extract_info(url, download=False)
+            key = self._media_key(info)
+            cached = self.media_cache.lookup(key)
+            if cached is not None:
+                return self._from_media_cache(ydl, info, cached)
+
+            info = ydl.process_ie_result(info, download=True)
+            self.media_cache.store_file(key, Path(info['requested_downloads'][0]['filepath']))
+            return info
+
+    def _media_key(self, info: Dict[str, Any]) -> str:
+        postprocessors = ','.join(pp.get('preferredcodec', pp['key']) for pp in self.ydl_opts['postprocessors'])
+        return MediaCache.key(
+            info.get('extractor_key') or info.get('extractor', 'generic'),
+            str(info['id']),
+            f"{self.config.download.format}|{postprocessors}"
+        )
+
+    def _from_media_cache(self, ydl: yt_dlp.YoutubeDL, info: Dict[str, Any], cached: Path) -> Dict[str, Any]:
+        # Link into the download directory, so removing the original after
+        # separation leaves the cached copy alone. The name comes from the
+        # output template like a fresh download's, which also sanitizes
+        # path separators in the title.
+        file_path = Path(ydl.prepare_filename(info)).with_suffix(cached.suffix)
+        link_or_copy(cached, file_path)
+        logger.info(
+            f"Reusing cached media for {info.get('title')} "
+            f"({self.media_cache.hits} hits, {self.media_cache.misses} misses, "
+            f"{self.media_cache.bytes_saved} bytes saved)"
+        )
+        return {**info, 'requested_downloads': [{'filepath': str(file_path)}]}
+
+    @staticmethod
+    def _progress_hook(report: ProgressThrottle, d: Dict[str, Any]) -> None:
+        if d['status'] == 'downloading':
+            total = d.get('total_bytes') or d.get('total_bytes_estimate')
+            fraction = d.get('downloaded_bytes', 0) / total if total else 0.0
+            # 1.0 is kept for the finished event, which the throttle always forwards
+            report(min(fraction, 0.999), speed=d.get('speed'), eta=d.get('eta'), details="Downloading")
+        elif d['status'] == 'finished':
+            report(1.0, details="Downloaded")
+
+    @staticmethod
+    def _postprocessor_hook(report: ProgressThrottle, d: Dict[str, Any]) -> None:
+        if d['status'] == 'started':
+            report(1.0, details=f"Post-processing ({d.get('postprocessor')})")
+
+    async def download(self, url: str, progress: Optional[DownloadProgressCallback] = None) -> DownloadResult:
+        """Download ``url``, reporting rate-limited progress to ``progress`` on this loop"""
+        report = None
+        loop = asyncio.get_running_loop()
+        if progress is not None:
+            report = ProgressThrottle(
+                lambda fraction, **details: loop.call_soon_threadsafe(partial(progress, fraction, **details)),
+                self.config.processing.progress_interval
+            )
         try:
-            with yt_dlp.YoutubeDL(self.ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                return self._process_download_info(info)
+            async with self._slots:
+                info = await loop.run_in_executor(None, partial(self._extract_info, url, report))
+            return self._process_download_info(info)
         except Exception as e:
             raise RuntimeError(f"Download failed: {str(e)}")
 
-    async def batch_download(self, urls: List[str]) -> List[DownloadResult]:
+    def _probe_info(self, url: str) -> Dict[str, Any]:
+        opts = {'format': self.config.download.format, 'skip_download': True, 'quiet': True}
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            return ydl.extract_info(url, download=False)
+
+    async def probe(self, url: str) -> Dict[str, Any]:
+        """Title, duration and expected download size of ``url`` without downloading it"""
+        loop = asyncio.get_running_loop()
+        async with self._probe_slots:
+            info = await loop.run_in_executor(None, partial(self._probe_info, url))
+        probed = {
+            'title': info.get('title'),
+            'duration': info.get('duration'),
+            'filesize': info.get('filesize') or info.get('filesize_approx'),
+        }
+        return {key: value for key, value in probed.items() if value is not None}
+
+    async def batch_download(self, urls: List[str]) -> BatchDownloadResult:
+        """Download ``urls`` concurrently, up to ``download.concurrent_downloads`` at a time"""
+        outcomes = await asyncio.gather(
+            *(self.download(url) for url in urls),
+            return_exceptions=True
+        )
         results = []
-        for url in urls:
-            try:
-                result = await self.download(url)
-                results.append(result)
-            except Exception as e:
-                # Log error but continue with remaining URLs
-                print(f"Error downloading {url}: {str(e)}")
-        return results
+        failures = {}
+        for url, outcome in zip(urls, outcomes):
+            if isinstance(outcome, Exception):
+                # Collect the error and continue with the remaining URLs
+                failures[url] = str(outcome)
+                logger.warning(f"Error downloading {url}: {str(outcome)}")
+            else:
+                results.append(outcome)
+        return BatchDownloadResult(results=results, failures=failures)
+
+    @staticmethod
+    def is_collection(url: str) -> bool:
+        """Whether ``url`` looks like a playlist, channel or album rather than one track"""
+        parsed = urlparse(url)
+        return bool(_COLLECTION_PATH.search(parsed.path)) or "list" in parse_qs(parsed.query)
+
+    def _extract_flat(self, url: str) -> Dict[str, Any]:
+        # Lists entries from the playlist pages only, without resolving each entry
+        opts = {'extract_flat': 'in_playlist', 'skip_download': True, 'quiet': True}
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            return ydl.extract_info(url, download=False)
+
+    async def expand(self, url: str) -> List[PlaylistEntry]:
+        """Enumerate the entries of a playlist or channel URL with flat extraction.
+
+        Single-track URLs are returned as they are without a network call.
+        Channel tabs and other nested playlists are expanded concurrently.
+        """
+        if not self.is_collection(url):
+            return [PlaylistEntry(url=url)]
+        loop = asyncio.get_running_loop()
+        try:
+            async with self._slots:
+                info = await loop.run_in_executor(None, partial(self._extract_flat, url))
+        except Exception as e:
+            raise RuntimeError(f"Playlist expansion failed: {str(e)}")
+        return await self._flatten_entries(info)
+
+    async def _flatten_entries(self, info: Dict[str, Any]) -> List[PlaylistEntry]:
+        if info.get('_type') not in ('playlist', 'multi_video'):
+            url = info.get('webpage_url') or info.get('url')
+            return [PlaylistEntry(url=url, title=info.get('title'))] if url else []
+
+        playlist = info.get('title')
+        expanded = []
+        for index, entry in enumerate(info.get('entries') or [], start=1):
+            if not entry:
+                continue
+            if entry.get('_type') == 'playlist':
+                expanded.append(self._flatten_entries(entry))
+            elif self._is_nested_playlist(entry):
+                expanded.append(self.expand(entry['url']))
+            else:
+                expanded.append(self._single_entry(entry, playlist, index))
+
+        entries = []
+        for group in await asyncio.gather(*expanded):
+            entries.extend(group)
+        return entries
+
+    @staticmethod
+    def _is_nested_playlist(entry: Dict[str, Any]) -> bool:
+        # Flat channel listings link their tabs as unresolved URL entries
+        ie_key = entry.get('ie_key') or ''
+        return bool(entry.get('url')) and ('Tab' in ie_key or 'Playlist' in ie_key)
+
+    async def _single_entry(
+        self,
+        entry: Dict[str, Any],
+        playlist: Optional[str],
+        index: int
+    ) -> List[PlaylistEntry]:
+        url = entry.get('webpage_url') or entry.get('url')
+        if not url:
+            return []
+        return [PlaylistEntry(
+            url=url,
+            title=entry.get('title'),
+            playlist=playlist,
+            index=index,
+            duration=entry.get('duration')
+        )]
 
     def _process_download_info(self, info: dict) -> DownloadResult:
         title = info.get('title', '')
@@ -0,0 +1,130 @@
+"""
+Compressed output encoding for separated stems
+"""
+from pathlib import Path
+from typing import Dict, List, Optional
+from concurrent.futures import Executor, ThreadPoolExecutor
+from enum import Enum
+import asyncio
+import os
+import subprocess
+import wave
+import lameenc
+from cloud_splitter.processor import ProcessingResult
+from cloud_splitter.exceptions import ProcessingError
+from cloud_splitter.utils.cache import partial_path
+from cloud_splitter.utils.logging import get_logger
+
+logger = get_logger()
+
+class OutputFormat(str, Enum):
+    WAV = "wav"
+    FLAC = "flac"
+    OPUS = "opus"
+    MP3 = "mp3"
+
+class StemEncoder:
+    """Encodes separated WAV stems to ``processing.output_format`` in a thread pool.
+
+    When a compressed format is configured the processor writes its WAV
+    stems to ``cache_dir/staging``; this stage encodes them into
+    ``paths.output_dir`` and removes the staged WAVs. Every stem is its own
+    pool task, and encoding runs while the next track is being separated.
+    """
+
+    def __init__(self, config, executor: Optional[Executor] = None):
+        self.config = config
+        self.format = OutputFormat(config.processing.output_format.lower())
+        self._executor = executor
+        self._owns_executor = executor is None
+
+    @property
+    def enabled(self) -> bool:
+        return self.format != OutputFormat.WAV
+
+    def _pool(self) -> Executor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max(self.config.processing.encode_workers, 1),
+                thread_name_prefix="stem-encoder"
+            )
+        return self._executor
+
+    async def encode(self, result: ProcessingResult) -> ProcessingResult:
+        """Encode every stem of ``result`` and return the result for the encoded files"""
+        if not self.enabled:
+            return result
+
+        output_dir = self.config.paths.output_dir / result.output_dir.name
+        targets = {
+            stem: output_dir / path.parent.name / f"{stem}.{self.format.value}"
+            for stem, path in result.stems.items()
+        }
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(self._pool(), self._encode_stem, result.stems[stem], target)
+            for stem, target in targets.items()
+        ))
+
+        for path in result.stems.values():
+            path.unlink(missing_ok=True)
+        staged_dirs = {path.parent for path in result.stems.values()} | {result.output_dir}
+        for directory in sorted(staged_dirs, key=lambda d: len(d.parts), reverse=True):
+            try:
+                directory.rmdir()
+            except OSError:
+                pass
+        logger.info(f"Encoded {len(targets)} stems of {result.input_file} to {self.format.value}")
+        return ProcessingResult(
+            input_file=result.input_file,
+            output_dir=output_dir,
+            stems=targets,
+            separator_used=result.separator_used,
+            skipped_seconds=result.skipped_seconds
+        )
+
+    def _encode_stem(self, source: Path, target: Path) -> None:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        partial = partial_path(target)
+        try:
+            if self.format == OutputFormat.MP3:
+                self._encode_mp3(source, partial)
+            else:
+                self._encode_ffmpeg(source, partial)
+            os.replace(partial, target)
+        except Exception as e:
+            partial.unlink(missing_ok=True)
+            raise ProcessingError(f"Encoding {source} to {self.format.value} failed: {str(e)}")
+
+    def _encode_mp3(self, source: Path, target: Path) -> None:
+        with wave.open(str(source), "rb") as wav_file:
+            encoder = lameenc.Encoder()
+            encoder.set_bit_rate(self.config.processing.mp3_bitrate)
+            encoder.set_in_sample_rate(wav_file.getframerate())
+            encoder.set_channels(wav_file.getnchannels())
+            encoder.set_quality(2)
+            with open(target, "wb") as out:
+                # Encode in blocks so long stems never sit in memory whole
+                while True:
+                    frames = wav_file.readframes(1 << 16)
+                    if not frames:
+                        break
+                    out.write(encoder.encode(frames))
+                out.write(encoder.flush())
+
+    def _encode_ffmpeg(self, source: Path, target: Path) -> None:
+        codec: Dict[OutputFormat, List[str]] = {
+            OutputFormat.FLAC: ["-c:a", "flac"],
+            OutputFormat.OPUS: ["-c:a", "libopus", "-b:a", f"{self.config.processing.opus_bitrate}k"],
+        }
+        completed = subprocess.run(
+            ["ffmpeg", "-y", "-v", "error", "-i", str(source), *codec[self.format], str(target)],
+            capture_output=True
+        )
+        if completed.returncode != 0:
+            raise RuntimeError(completed.stderr.decode(errors="replace").strip())
+
+    def close(self) -> None:
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -0,0 +1,175 @@
+"""
+Compiled inference backends for separation models
+"""
+from pathlib import Path
+from typing import List
+from enum import Enum
+import math
+import os
+import uuid
+from demucs.apply import BagOfModels
+import torch
+from torch.nn import functional as F
+from cloud_splitter.utils.logging import get_logger
+
+logger = get_logger()
+
+class InferenceBackend(str, Enum):
+    EAGER = "eager"
+    TORCHSCRIPT = "torchscript"
+
+class Precision(str, Enum):
+    FP32 = "fp32"
+    INT8 = "int8"
+    BF16 = "bf16"
+
+class AutocastModel(torch.nn.Module):
+    """Runs a separation model under bfloat16 autocast and returns float32"""
+
+    def __init__(self, module: torch.nn.Module, device: str):
+        super().__init__()
+        self.module = module
+        self.sources = module.sources
+        self.samplerate = module.samplerate
+        self.audio_channels = module.audio_channels
+        self.segment = module.segment
+        self.device_type = torch.device(device).type
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        with torch.autocast(device_type=self.device_type, dtype=torch.bfloat16):
+            out = self.module(x)
+        return out.float()
+
+class CompiledModel(torch.nn.Module):
+    """A compiled separation model with the attributes apply_model expects.
+
+    The compiled graph only accepts ``[batch_size, channels, segment_length]``
+    inputs, so smaller batches and shorter segments are zero padded on the
+    way in and trimmed on the way out, the same way HTDemucs pads segments
+    internally.
+    """
+
+    def __init__(self, module: torch.nn.Module, reference: torch.nn.Module, batch_size: int, segment_length: int):
+        super().__init__()
+        self.module = module
+        self.sources = reference.sources
+        self.samplerate = reference.samplerate
+        self.audio_channels = reference.audio_channels
+        self.segment = segment_length / reference.samplerate
+        self.batch_size = batch_size
+        self.segment_length = segment_length
+        # Frozen graphs have no parameters; BagOfModels looks one up for the device
+        self._device_anchor = torch.nn.Parameter(torch.empty(0), requires_grad=False)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        batch, _, length = x.shape
+        if batch > self.batch_size or length > self.segment_length:
+            raise ValueError(
+                f"Compiled model expects at most {self.batch_size} x {self.segment_length} samples, "
+                f"got {batch} x {length}"
+            )
+        x = F.pad(x, (0, self.segment_length - length))
+        if batch < self.batch_size:
+            x = torch.cat([x, x.new_zeros(self.batch_size - batch, *x.shape[1:])])
+        return self.module(x)[:batch, ..., :length]
+
+def apply_precision(model: torch.nn.Module, precision: str, device: str) -> torch.nn.Module:
+    """Return ``model`` running at ``precision``, or ``model`` itself for fp32.
+
+    ``int8`` dynamically quantizes the Linear and LSTM layers, which only
+    CPU kernels support; on other devices it falls back to fp32. ``bf16``
+    runs every sub-model under bfloat16 autocast.
+    """
+    if precision == Precision.FP32:
+        return model
+    if precision == Precision.INT8:
+        if torch.device(device).type != "cpu":
+            logger.warning(f"int8 precision is only supported on CPU; using fp32 on {device}")
+            return model
+        return torch.ao.quantization.quantize_dynamic(
+            model, {torch.nn.Linear, torch.nn.LSTM}, dtype=torch.qint8
+        )
+    if precision == Precision.BF16:
+        if isinstance(model, BagOfModels):
+            return BagOfModels([AutocastModel(sub, device) for sub in model.models], model.weights)
+        return AutocastModel(model, device)
+    raise ValueError(f"Unsupported precision: {precision}")
+
+def signal_to_distortion(reference: torch.Tensor, estimate: torch.Tensor) -> float:
+    """SDR of ``estimate`` against ``reference`` in dB; infinite when identical"""
+    noise = (reference - estimate).pow(2).sum().item()
+    if noise == 0:
+        return float("inf")
+    return 10 * math.log10(reference.pow(2).sum().item() / noise)
+
+def max_abs_difference(eager: torch.nn.Module, compiled: torch.nn.Module, example: torch.Tensor) -> float:
+    """Largest absolute difference between the eager and compiled outputs for ``example``"""
+    with torch.no_grad():
+        return (eager(example) - compiled(example)).abs().max().item()
+
+def compile_model(
+    model: torch.nn.Module,
+    backend: str,
+    name: str,
+    device: str,
+    batch_size: int,
+    segment_length: int,
+    artifact_dir: Path,
+    tolerance: float = 1e-3
+) -> torch.nn.Module:
+    """Return ``model`` compiled for ``backend``, or ``model`` itself for eager.
+
+    Compiled graphs are cached in ``artifact_dir`` keyed by model, device,
+    input shape and torch version. Every sub-model is checked against its
+    eager output on a random input; if any differs by more than
+    ``tolerance``, the eager model is used instead.
+    """
+    if backend == InferenceBackend.EAGER:
+        return model
+    if backend != InferenceBackend.TORCHSCRIPT:
+        raise ValueError(f"Unsupported inference backend: {backend}")
+
+    sub_models = list(model.models) if isinstance(model, BagOfModels) else [model]
+    compiled: List[torch.nn.Module] = []
+    for index, sub_model in enumerate(sub_models):
+        example = torch.randn(batch_size, sub_model.audio_channels, segment_length, device=device)
+        artifact = Path(artifact_dir).expanduser() / (
+            f"{name}-{index}-{device}-{batch_size}x{sub_model.audio_channels}x{segment_length}"
+            f"-torch{torch.__version__}.pt"
+        )
+        module = _load_or_trace(sub_model, example, artifact, device)
+        wrapped = CompiledModel(module, sub_model, batch_size, segment_length)
+
+        difference = max_abs_difference(sub_model, wrapped, example)
+        if difference > tolerance:
+            logger.warning(
+                f"Compiled {name} differs from eager inference by {difference:.2e}; "
+                f"falling back to eager"
+            )
+            return model
+        compiled.append(wrapped)
+
+    logger.info(f"Using {backend} inference for {name} on {device}")
+    if isinstance(model, BagOfModels):
+        return BagOfModels(compiled, model.weights)
+    return compiled[0]
+
+def _load_or_trace(model: torch.nn.Module, example: torch.Tensor, artifact: Path, device: str) -> torch.nn.Module:
+    if artifact.exists():
+        logger.info(f"Loading compiled model from {artifact}")
+        return _optimize(torch.jit.load(str(artifact), map_location=device))
+
+    logger.info(f"Compiling {type(model).__name__} with TorchScript, this happens once per model")
+    with torch.no_grad():
+        traced = torch.jit.trace(model.eval(), example, check_trace=False)
+
+    artifact.parent.mkdir(parents=True, exist_ok=True)
+    scratch = artifact.with_name(f".{artifact.name}.{uuid.uuid4().hex}")
+    torch.jit.save(traced, str(scratch))
+    os.replace(scratch, artifact)
+    return _optimize(traced)
+
+def _optimize(module: torch.jit.ScriptModule) -> torch.jit.ScriptModule:
+    # Graphs rewritten by optimize_for_inference do not survive save/load,
+    # so the plain trace is stored and optimized after every load
+    return torch.jit.optimize_for_inference(torch.jit.freeze(module.eval()))
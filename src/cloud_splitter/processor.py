@@ -1,11 +1,30 @@
 from pathlib import Path
-from typing import List, Dict, Optional
-import subprocess
+from typing import Any, Callable, Iterator, List, Dict, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
 from enum import Enum
-import demucs.separate
+import asyncio
+import multiprocessing
+import os
+import threading
+import wave
+from demucs.apply import BagOfModels, apply_model
+from demucs.audio import AudioFile, save_audio
+from demucs.pretrained import get_model
 import numpy as np
 import torch
+from torch.nn import functional as F
 from pydantic import BaseModel
+from cloud_splitter.inference import InferenceBackend, Precision, apply_precision, compile_model
+from cloud_splitter.utils.audio import load_decoded
+from cloud_splitter.utils.cache import DecodedAudioCache, SeparationCache, link_or_copy, partial_path
+from cloud_splitter.utils.checkpoint import SeparationCheckpoint, prune_checkpoints
+from cloud_splitter.utils.logging import get_logger
+from cloud_splitter.utils.status import ProgressThrottle
+
+logger = get_logger()
+
+ProgressCallback = Callable[[float], None]
 
 class SeparatorType(str, Enum):
     DEMUCS = "demucs"
@@ -16,56 +35,905 @@ class ProcessingResult(BaseModel):
     output_dir: Path
     stems: Dict[str, Path]
     separator_used: SeparatorType
+    # Seconds of input skipped as silence instead of run through the model
+    skipped_seconds: float = 0.0
+
+class ModelRegistry:
+    """Keeps separation models resident in memory between files.
+
+    Models are keyed by ``(name, device, variant)`` and loaded on first use;
+    ``variant`` names how the loaded model was transformed (e.g. compiled).
+    The registry holds at most ``max_models`` entries and evicts the least
+    recently used one beyond that, so with the default of one resident
+    model, switching ``config.demucs.model`` releases the previous model.
+    """
+
+    def __init__(self, max_models: int = 1):
+        self.max_models = max_models
+        self._models: "OrderedDict[Tuple[str, str, str], torch.nn.Module]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        name: str,
+        device: str,
+        variant: str = "eager",
+        transform: Optional[Callable[[torch.nn.Module], torch.nn.Module]] = None
+    ) -> torch.nn.Module:
+        """Return the model for ``(name, device, variant)``, loading it if needed"""
+        key = (name, device, variant)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+
+            logger.info(f"Loading separation model {name} on {device}")
+            model = get_model(name)
+            model.to(device)
+            model.eval()
+            if transform is not None:
+                model = transform(model)
+            self._models[key] = model
+            self._enforce_limit()
+            return model
+
+    def evict(self, name: Optional[str] = None, device: Optional[str] = None) -> int:
+        """Drop resident models matching ``name``/``device``; returns the count"""
+        with self._lock:
+            keys = [
+                key for key in self._models
+                if (name is None or key[0] == name) and (device is None or key[1] == device)
+            ]
+            for key in keys:
+                self._drop(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        self.evict()
+
+    def _enforce_limit(self) -> None:
+        while len(self._models) > max(self.max_models, 1):
+            oldest = next(iter(self._models))
+            self._drop(oldest)
+
+    def _drop(self, key: Tuple[str, str, str]) -> None:
+        del self._models[key]
+        logger.info(f"Evicted separation model {key[0]} from {key[1]}")
+        if key[1].startswith("cuda"):
+            torch.cuda.empty_cache()
+
+    def __contains__(self, key: Tuple[str, ...]) -> bool:
+        return any(resident[:len(key)] == key for resident in self._models)
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+def _segment_length(model: torch.nn.Module) -> int:
+    """Number of samples the model was trained to separate in one pass"""
+    if isinstance(model, BagOfModels):
+        segment = min(float(sub_model.segment) for sub_model in model.models)
+    else:
+        segment = float(model.segment)
+    return int(model.samplerate * segment)
+
+def _transition_weight(segment_length: int) -> torch.Tensor:
+    """Triangular overlap-add window, as used by demucs.apply.apply_model"""
+    weight = torch.cat([
+        torch.arange(1, segment_length // 2 + 1),
+        torch.arange(segment_length - segment_length // 2, 0, -1)
+    ]).float()
+    return weight / weight.max()
+
+def _scaled_progress(progress: Optional[ProgressCallback], start: float, span: float) -> Optional[ProgressCallback]:
+    """Map a sub-task's 0..1 progress onto ``start..start + span`` of the whole job"""
+    if progress is None:
+        return None
+    return lambda fraction: progress(start + span * fraction)
+
+class _StemStreamWriter:
+    """Appends separated sources to one raw 16-bit PCM file per stem as they arrive.
+
+    The raw files live in a checkpoint directory, so an interrupted
+    separation can reopen them at ``resume_frames`` and carry on. They are
+    turned into WAV files at ``paths`` only once the writer is closed
+    without an error.
+    """
+
+    def __init__(
+        self,
+        paths: Dict[str, Path],
+        checkpoint: SeparationCheckpoint,
+        samplerate: int,
+        channels: int,
+        resume_frames: int = 0
+    ):
+        self._paths = paths
+        self._checkpoint = checkpoint
+        self._samplerate = samplerate
+        self._channels = channels
+        self._files = {}
+        checkpoint.directory.mkdir(parents=True, exist_ok=True)
+        for name in paths:
+            raw = checkpoint.stem_file(name)
+            raw_file = open(raw, "r+b" if raw.exists() else "wb")
+            # Drop anything written after the last checkpoint
+            raw_file.truncate(resume_frames * channels * 2)
+            raw_file.seek(0, os.SEEK_END)
+            self._files[name] = raw_file
+
+    def write(self, sources: Dict[str, torch.Tensor]) -> None:
+        for name, source in sources.items():
+            frames = (source.clamp(-1, 1).t().contiguous().numpy() * (2**15 - 1)).astype("<i2")
+            self._files[name].write(frames.tobytes())
+
+    def sync(self) -> None:
+        """Make everything written so far durable before a checkpoint refers to it"""
+        for raw_file in self._files.values():
+            raw_file.flush()
+            os.fsync(raw_file.fileno())
+
+    def close(self, commit: bool = True) -> None:
+        for name, raw_file in self._files.items():
+            raw_file.close()
+            if commit:
+                self._finish(name)
+
+    def _finish(self, name: str) -> None:
+        path = self._paths[name]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = partial_path(path)
+        with wave.open(str(partial), "wb") as wav_file, open(self._checkpoint.stem_file(name), "rb") as raw_file:
+            wav_file.setnchannels(self._channels)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(self._samplerate)
+            while True:
+                # Whole frames, since 1 MiB is a multiple of every frame size used
+                chunk = raw_file.read(1 << 20)
+                if not chunk:
+                    break
+                wav_file.writeframesraw(chunk)
+        os.replace(partial, path)
+
+    def __enter__(self) -> "_StemStreamWriter":
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        self.close(commit=exc_type is None)
+
+# Shared by every Processor in the process so that models survive across jobs
+model_registry = ModelRegistry()
 
 class Processor:
-    def __init__(self, config):
+    def __init__(self, config, registry: Optional[ModelRegistry] = None):
         self.config = config
         self.device = "cuda" if torch.cuda.is_available() and not config.demucs.cpu_only else "cpu"
+        self.registry = registry if registry is not None else model_registry
+        self.cache = None
+        self.decoded = None
+        if config.cache.enabled:
+            self.cache = SeparationCache(
+                config.paths.cache_dir / "separation",
+                config.cache.separation_max_size
+            )
+            if config.cache.decoded_audio:
+                self.decoded = DecodedAudioCache(
+                    config.paths.cache_dir / "decoded",
+                    config.cache.decoded_max_size
+                )
+        prune_checkpoints(config.paths.cache_dir / "checkpoints", config.cache.checkpoint_max_age)
+
+    @property
+    def concurrency(self) -> int:
+        """Number of files this processor can usefully separate at once"""
+        return 1
+
+    def close(self) -> None:
+        pass
+
+    def warm_up(self) -> None:
+        """Load the configured model and run one dummy segment through it.
 
-    async def process_file(self, input_file: Path) -> ProcessingResult:
+        This fetches weights on first use and warms torch kernels so the
+        first real job runs as fast as the rest.
+        """
+        if self.config.processing.separator.lower() != SeparatorType.DEMUCS:
+            return
+        model = self._load_model()
+        # Quiet noise rather than zeros so the segment is not skipped as silence
+        dummy = torch.randn(model.audio_channels, _segment_length(model)) * 1e-2
+        self._separate_tracks(model, [dummy])
+
+    async def process_file(self, input_file: Path, progress: Optional[ProgressCallback] = None) -> ProcessingResult:
         separator = self.config.processing.separator.lower()
         if separator == SeparatorType.DEMUCS:
-            return await self._process_demucs(input_file)
+            return await self._process_demucs(input_file, progress)
         elif separator == SeparatorType.SPLEETER:
             return await self._process_spleeter(input_file)
         else:
             raise ValueError(f"Unsupported separator: {separator}")
 
-    async def _process_demucs(self, input_file: Path) -> ProcessingResult:
-        output_dir = self.config.paths.output_dir / input_file.stem
-        output_dir.mkdir(parents=True, exist_ok=True)
+    def _load_model(self) -> torch.nn.Module:
+        self.registry.max_models = self.config.demucs.max_loaded_models
+        backend = self.config.demucs.backend
+        precision = self.config.demucs.precision
+        batch_size = max(self.config.demucs.batch_size, 1)
+        name = self.config.demucs.model
+        variant = backend if backend == InferenceBackend.EAGER else f"{backend}/{batch_size}"
+        if precision != Precision.FP32:
+            name = f"{name}-{precision}"
+            variant = f"{variant}/{precision}"
+
+        def prepare(model: torch.nn.Module) -> torch.nn.Module:
+            segment_length = _segment_length(model)
+            model = apply_precision(model, precision, self.device)
+            return compile_model(
+                model,
+                backend,
+                name,
+                self.device,
+                batch_size,
+                segment_length,
+                self.config.paths.cache_dir / "compiled"
+            )
+
+        return self.registry.get(self.config.demucs.model, self.device, variant, transform=prepare)
+
+    def _decoded_audio(self, input_file: Path, model: torch.nn.Module) -> Optional[torch.Tensor]:
+        """``(channels, frames)`` view of the memory-mapped decode of ``input_file``.
+
+        Looked up once per job and passed as ``audio`` to the readers below,
+        so a decode evicted from the cache is never repeated within the job.
+        Without the cache they read ``input_file`` directly.
+        """
+        if self.decoded is None:
+            return None
+        audio = load_decoded(input_file, model.samplerate, model.audio_channels, self.decoded)
+        return torch.from_numpy(audio).t()
+
+    def _load_audio(
+        self,
+        input_file: Path,
+        model: torch.nn.Module,
+        audio: Optional[torch.Tensor] = None
+    ) -> torch.Tensor:
+        if audio is not None:
+            return audio
+        return AudioFile(input_file).read(
+            streams=0,
+            samplerate=model.samplerate,
+            channels=model.audio_channels
+        )
+
+    def _audio_duration(
+        self,
+        input_file: Path,
+        model: torch.nn.Module,
+        audio: Optional[torch.Tensor] = None
+    ) -> float:
+        if audio is not None:
+            return audio.shape[-1] / model.samplerate
+        return AudioFile(input_file).duration
+
+    def _read_window(
+        self,
+        input_file: Path,
+        model: torch.nn.Module,
+        offset: int,
+        length: int,
+        audio: Optional[torch.Tensor] = None
+    ) -> torch.Tensor:
+        if audio is not None:
+            return audio[:, offset:offset + length]
+        return AudioFile(input_file).read(
+            seek_time=offset / model.samplerate,
+            duration=length / model.samplerate,
+            streams=0,
+            samplerate=model.samplerate,
+            channels=model.audio_channels
+        )
+
+    def _should_stream(
+        self,
+        input_file: Path,
+        model: torch.nn.Module,
+        audio: Optional[torch.Tensor] = None
+    ) -> bool:
+        demucs = self.config.demucs
+        return demucs.streaming and self._audio_duration(input_file, model, audio) > demucs.stream_threshold
+
+    def _separate_tracks(
+        self,
+        model: torch.nn.Module,
+        wavs: List[torch.Tensor],
+        progress: Optional[ProgressCallback] = None,
+        shifts: Optional[int] = None,
+        skipped: Optional[List[torch.Tensor]] = None
+    ) -> List[Dict[str, torch.Tensor]]:
+        """Separate several tracks, packing their segments into shared forward passes.
+
+        With ``demucs.skip_silence``, segments quieter than
+        ``demucs.silence_threshold`` are not run through the model and
+        separate to silence. If ``skipped`` is given, it receives one
+        boolean mask per track marking the samples no segment inferred.
+        """
+        if shifts is None:
+            shifts = self.config.demucs.shifts
+        names, mixing = self._stem_selection(model)
+        segment_length = _segment_length(model)
+        if shifts:
+            # apply_model's shift trick extends each chunk by up to half a second,
+            # which must still fit in the model's training segment
+            segment_length -= int(0.5 * model.samplerate)
+        stride = max(int((1 - self.config.demucs.overlap) * segment_length), 1)
+        weight = _transition_weight(segment_length)
+        batch_size = max(self.config.demucs.batch_size, 1)
+
+        # Normalise each track like demucs.separate does, undone on the sources
+        refs = []
+        outs = []
+        sum_weights = []
+        for wav in wavs:
+            ref = wav.mean(0)
+            refs.append((ref.mean(), ref.std() + 1e-8))
+            outs.append(torch.zeros(len(names), *wav.shape))
+            sum_weights.append(torch.zeros(wav.shape[-1]))
+
+        segments = []
+        for index, wav in enumerate(wavs):
+            offsets = torch.arange(0, wav.shape[-1], stride)
+            silent = self._silent_segments(wav, offsets, segment_length)
+            covered = torch.zeros(wav.shape[-1], dtype=torch.bool)
+            for offset, is_silent in zip(offsets.tolist(), silent.tolist()):
+                # A silent segment separates to zeros but still takes part in
+                # the crossfade, exactly as if the model had returned silence
+                length = min(segment_length, wav.shape[-1] - offset)
+                if is_silent:
+                    sum_weights[index][offset:offset + length] += weight[:length]
+                else:
+                    segments.append((index, offset))
+                    covered[offset:offset + length] = True
+            if skipped is not None:
+                skipped.append(~covered)
+
+        for start in range(0, len(segments), batch_size):
+            batch = segments[start:start + batch_size]
+            chunks = []
+            for index, offset in batch:
+                mean, std = refs[index]
+                chunk = (wavs[index][..., offset:offset + segment_length] - mean) / std
+                chunks.append(F.pad(chunk, (0, segment_length - chunk.shape[-1])))
+
+            out = apply_model(
+                model,
+                torch.stack(chunks),
+                shifts=shifts,
+                split=False,
+                device=self.device
+            ).cpu()
+            # Keep only the requested stems before the overlap-add
+            out = torch.einsum("ks,bsct->bkct", mixing, out)
+
+            # Scatter each segment back onto its own track with a crossfade
+            for (index, offset), chunk_out in zip(batch, out):
+                length = min(segment_length, wavs[index].shape[-1] - offset)
+                outs[index][..., offset:offset + length] += weight[:length] * chunk_out[..., :length]
+                sum_weights[index][offset:offset + length] += weight[:length]
+
+            if progress is not None:
+                progress(min(start + batch_size, len(segments)) / len(segments))
+
+        results = []
+        offsets = mixing.sum(dim=1)[:, None, None]
+        for (mean, std), out, sum_weight in zip(refs, outs, sum_weights):
+            out = out / sum_weight.clamp(min=1e-8) * std + mean * offsets
+            results.append(dict(zip(names, out)))
+        return results
+
+    def _silent_segments(self, wav: torch.Tensor, offsets: torch.Tensor, segment_length: int) -> torch.Tensor:
+        """Whether the RMS level of each segment is below ``demucs.silence_threshold`` dBFS"""
+        if not self.config.demucs.skip_silence or wav.shape[-1] == 0:
+            return torch.zeros(len(offsets), dtype=torch.bool)
+
+        # Segment energies from one cumulative sum instead of a pass per segment
+        power = F.pad(wav.double().pow(2).mean(0).cumsum(0), (1, 0))
+        ends = (offsets + segment_length).clamp(max=wav.shape[-1])
+        rms = ((power[ends] - power[offsets]) / (ends - offsets)).clamp(min=0).sqrt()
+        return rms < 10 ** (self.config.demucs.silence_threshold / 20)
+
+    def _stem_selection(self, model: torch.nn.Module) -> Tuple[List[str], torch.Tensor]:
+        """Requested stems and the matrix that mixes model sources into them.
+
+        A stem is either one of the model's sources or ``no_<source>``, the
+        sum of every other source (demucs' two-stem mode, e.g. karaoke).
+        Sources that are not requested are never accumulated or written.
+        """
+        names = []
+        rows = []
+        for stem in self.config.processing.stems:
+            if stem in model.sources:
+                row = [1.0 if source == stem else 0.0 for source in model.sources]
+            elif stem.startswith("no_") and stem[3:] in model.sources:
+                row = [0.0 if source == stem[3:] else 1.0 for source in model.sources]
+            else:
+                logger.warning(f"Stem {stem} is not produced by model {self.config.demucs.model}")
+                continue
+            names.append(stem)
+            rows.append(row)
+
+        if not names:
+            raise ValueError(f"None of the requested stems are produced by model {self.config.demucs.model}")
+        return names, torch.tensor(rows)
+
+    def _output_dir(self, input_file: Path) -> Path:
+        # Stems bound for a compressed format are staged locally as WAV and
+        # only their encoded versions are written to the output directory
+        if self.config.processing.output_format.lower() != "wav":
+            return self.config.paths.cache_dir / "staging" / input_file.stem
+        return self.config.paths.output_dir / input_file.stem
+
+    def _stem_path(self, output_dir: Path, stem: str) -> Path:
+        return output_dir / self.config.demucs.model / f"{stem}.wav"
+
+    async def process_batch(
+        self,
+        input_files: List[Path],
+        progress: Optional[ProgressCallback] = None
+    ) -> List[ProcessingResult]:
+        """Separate several files at once, sharing model forward passes between them"""
+        separator = self.config.processing.separator.lower()
+        if separator != SeparatorType.DEMUCS:
+            return [await self.process_file(input_file) for input_file in input_files]
+        return await self._process_demucs_batch(input_files, progress)
+
+    async def process_progressive(
+        self,
+        input_file: Path,
+        on_preview: Callable[[ProcessingResult], None],
+        progress: Optional[ProgressCallback] = None
+    ) -> ProcessingResult:
+        """Publish quick preview stems first, then replace them at full quality.
 
-        # Prepare demucs arguments
-        args = [
-            str(input_file),
-            "-n", self.config.demucs.model,
-            "--shifts", str(self.config.demucs.shifts),
-            "--out", str(output_dir)
-        ]
+        The opening ``processing.preview_duration`` seconds are separated
+        without shifts and written to the final stem paths, ``on_preview``
+        is called with that result, and the full separation then atomically
+        replaces each preview file as it completes.
+        """
+        preview = await self._process_preview(input_file)
+        on_preview(preview)
+        return await self.process_file(input_file, progress)
 
-        if self.device == "cpu":
-            args.append("--device=cpu")
+    async def _process_preview(self, input_file: Path) -> ProcessingResult:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._separate_preview, input_file)
 
+    def _separate_preview(self, input_file: Path) -> ProcessingResult:
         try:
-            demucs.separate.main(args)
-            
-            # Collect stem paths
-            stems = {}
-            for stem in self.config.processing.stems:
-                stem_path = output_dir / self.config.demucs.model / stem / input_file.stem
-                if stem_path.exists():
-                    stems[stem] = stem_path
-
-            return ProcessingResult(
-                input_file=input_file,
-                output_dir=output_dir,
-                stems=stems,
-                separator_used=SeparatorType.DEMUCS
+            model = self._load_model()
+            length = int(self.config.processing.preview_duration * model.samplerate)
+            wav = self._read_window(input_file, model, 0, length, self._decoded_audio(input_file, model))
+            sources = self._separate_tracks(model, [wav], shifts=0)[0]
+            return self._write_stems(input_file, model, sources)
+        except Exception as e:
+            raise RuntimeError(f"Demucs preview failed: {str(e)}")
+
+    async def _process_demucs(self, input_file: Path, progress: Optional[ProgressCallback] = None) -> ProcessingResult:
+        results = await self._process_demucs_batch([input_file], progress)
+        return results[0]
+
+    async def _process_demucs_batch(
+        self,
+        input_files: List[Path],
+        progress: Optional[ProgressCallback] = None
+    ) -> List[ProcessingResult]:
+        # Separation is synchronous and CPU bound, so keep it off the event loop
+        # and hand throttled progress back to the loop thread
+        loop = asyncio.get_running_loop()
+        report = None
+        if progress is not None:
+            report = ProgressThrottle(
+                lambda fraction: loop.call_soon_threadsafe(progress, fraction),
+                self.config.processing.progress_interval
             )
+        return await loop.run_in_executor(None, self._separate_files, input_files, report)
+
+    def _separate_files(
+        self,
+        input_files: List[Path],
+        progress: Optional[ProgressCallback] = None
+    ) -> List[ProcessingResult]:
+        try:
+            model = self._load_model()
+            results: Dict[int, ProcessingResult] = {}
+            share = 1 / max(len(input_files), 1)
+            done = 0.0
+
+            # Long inputs are streamed on their own so memory stays bounded
+            batched = []
+            decoded = {}
+            for index, input_file in enumerate(input_files):
+                audio = self._decoded_audio(input_file, model)
+                if self._should_stream(input_file, model, audio):
+                    key = self._cache_key(self._iter_pcm(input_file, model, audio), streamed=True)
+                    result = self._from_cache(input_file, key)
+                    if result is None:
+                        result = self._to_cache(key, self._process_streaming(
+                            input_file, model, _scaled_progress(progress, done, share), audio
+                        ))
+                    results[index] = result
+                    done += share
+                else:
+                    batched.append(index)
+                    decoded[index] = audio
+
+            wavs = {index: self._load_audio(input_files[index], model, decoded[index]) for index in batched}
+            keys = {}
+            pending = []
+            for index in batched:
+                keys[index] = self._cache_key([wavs[index].contiguous().numpy()])
+                cached = self._from_cache(input_files[index], keys[index])
+                if cached is not None:
+                    results[index] = cached
+                else:
+                    pending.append(index)
+
+            skipped: List[torch.Tensor] = []
+            separated = self._separate_tracks(
+                model,
+                [wavs[index] for index in pending],
+                _scaled_progress(progress, done, share * len(pending)),
+                skipped=skipped
+            )
+            for index, sources, silent in zip(pending, separated, skipped):
+                result = self._write_stems(input_files[index], model, sources)
+                result.skipped_seconds = self._log_skipped(input_files[index], model, silent.sum().item())
+                results[index] = self._to_cache(keys[index], result)
+
+            if progress is not None:
+                progress(1.0)
+            return [results[index] for index in range(len(input_files))]
         except Exception as e:
             raise RuntimeError(f"Demucs processing failed: {str(e)}")
 
+    def _iter_pcm(
+        self,
+        input_file: Path,
+        model: torch.nn.Module,
+        audio: Optional[torch.Tensor] = None
+    ) -> Iterator[Any]:
+        """Decoded PCM of ``input_file`` one streaming window at a time"""
+        window = int(self.config.demucs.stream_window * model.samplerate)
+        offset = 0
+        while True:
+            wav = self._read_window(input_file, model, offset, window, audio)
+            if wav.shape[-1]:
+                yield wav.contiguous().numpy()
+            if wav.shape[-1] < window:
+                break
+            offset += window
+
+    def _separation_variant(self, streamed: bool = False) -> str:
+        """Model name plus every setting other than shifts and stems that changes the output"""
+        demucs = self.config.demucs
+        variant = f"{demucs.model}-overlap{demucs.overlap:g}"
+        if self.config.demucs.precision != Precision.FP32:
+            # Reduced precision output differs from fp32 and is cached apart
+            variant = f"{variant}-{self.config.demucs.precision}"
+        if self.config.demucs.skip_silence:
+            variant = f"{variant}-silence{self.config.demucs.silence_threshold:g}"
+        if streamed:
+            # Windows are separated and crossfaded on their own
+            variant = f"{variant}-window{demucs.stream_window:g}-overlap{demucs.stream_overlap:g}"
+        return variant
+
+    def _cache_key(self, pcm_chunks, streamed: bool = False) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return SeparationCache.key(
+            pcm_chunks,
+            self._separation_variant(streamed),
+            self.config.demucs.shifts,
+            self.config.processing.stems
+        )
+
+    def _checkpoint(self, input_file: Path) -> SeparationCheckpoint:
+        """Checkpoint of a streamed separation, keyed by file content and settings"""
+        def file_chunks() -> Iterator[bytes]:
+            with open(input_file, "rb") as f:
+                while True:
+                    chunk = f.read(1 << 20)
+                    if not chunk:
+                        break
+                    yield chunk
+
+        key = SeparationCache.key(
+            file_chunks(),
+            self._separation_variant(streamed=True),
+            self.config.demucs.shifts,
+            self.config.processing.stems
+        )
+        return SeparationCheckpoint(self.config.paths.cache_dir / "checkpoints" / key)
+
+    def _from_cache(self, input_file: Path, key: Optional[str]) -> Optional[ProcessingResult]:
+        if key is None:
+            return None
+        cached = self.cache.lookup(key)
+        if cached is None:
+            return None
+
+        stems, metadata = cached
+        output_dir = self._output_dir(input_file)
+        for stem, path in stems.items():
+            link_or_copy(path, self._stem_path(output_dir, stem))
+        logger.info(
+            f"Separation cache hit for {input_file} "
+            f"({self.cache.hits} hits, {self.cache.misses} misses)"
+        )
+        result = self._collect_result(input_file, output_dir)
+        result.skipped_seconds = metadata.get("skipped_seconds", 0.0)
+        return result
+
+    def _to_cache(self, key: Optional[str], result: ProcessingResult) -> ProcessingResult:
+        if key is not None:
+            try:
+                self.cache.store_stems(key, result.stems, {"skipped_seconds": result.skipped_seconds})
+            except OSError as e:
+                logger.warning(f"Could not cache stems for {result.input_file}: {str(e)}")
+        return result
+
+    def _process_streaming(
+        self,
+        input_file: Path,
+        model: torch.nn.Module,
+        progress: Optional[ProgressCallback] = None,
+        audio: Optional[torch.Tensor] = None
+    ) -> ProcessingResult:
+        """Separate a long input window by window, appending stems to disk.
+
+        Each window is read with ``stream_overlap`` seconds of extra audio,
+        which is crossfaded linearly into the head of the next window, so at
+        most one window of audio and sources is held in memory at a time.
+        Progress is checkpointed after every window, and a separation of the
+        same file with the same settings resumes from the last checkpoint.
+        """
+        output_dir = self._output_dir(input_file)
+        window = int(self.config.demucs.stream_window * model.samplerate)
+        overlap = int(self.config.demucs.stream_overlap * model.samplerate)
+        paths = {name: self._stem_path(output_dir, name) for name in self._stem_selection(model)[0]}
+        total = max(self._audio_duration(input_file, model, audio) * model.samplerate, 1)
+        checkpoint = self._checkpoint(input_file)
+
+        tail: Optional[Dict[str, torch.Tensor]] = None
+        tail_length = 0
+        offset = 0
+        skipped_samples = 0
+        state = checkpoint.load()
+        if state is not None:
+            offset = state["offset"]
+            tail_length = state["tail_length"]
+            skipped_samples = state["skipped_samples"]
+            tail = checkpoint.load_tail()
+            logger.info(f"Resuming separation of {input_file} at {offset / model.samplerate:.0f}s")
+            if progress is not None:
+                progress(min(offset / total, 1.0))
+        else:
+            logger.info(f"Streaming separation of {input_file} in {self.config.demucs.stream_window}s windows")
+
+        with _StemStreamWriter(paths, checkpoint, model.samplerate, model.audio_channels, offset) as writer:
+            while True:
+                wav = self._read_window(input_file, model, offset, window + overlap, audio)
+                length = wav.shape[-1]
+                if length == 0:
+                    break
+
+                skipped: List[torch.Tensor] = []
+                sources = self._separate_tracks(model, [wav], skipped=skipped)[0]
+                if tail is not None:
+                    fade = min(tail_length, length)
+                    ramp = torch.linspace(0, 1, fade)
+                    for name in sources:
+                        sources[name][..., :fade] = (
+                            tail[name][..., :fade] * (1 - ramp) + sources[name][..., :fade] * ramp
+                        )
+
+                last = length < window + overlap
+                keep = length if last else window
+                skipped_samples += skipped[0][:keep].sum().item()
+                writer.write({name: source[..., :keep] for name, source in sources.items()})
+                if progress is not None:
+                    progress(min((offset + keep) / total, 1.0))
+                if last:
+                    tail = None
+                    break
+
+                tail = {name: source[..., window:] for name, source in sources.items()}
+                tail_length = length - window
+                offset += window
+                writer.sync()
+                checkpoint.save({
+                    "offset": offset,
+                    "tail_length": tail_length,
+                    "skipped_samples": skipped_samples,
+                }, tail)
+
+            if tail is not None:
+                writer.write(tail)
+
+        checkpoint.clear()
+        result = self._collect_result(input_file, output_dir)
+        result.skipped_seconds = self._log_skipped(input_file, model, skipped_samples)
+        return result
+
+    def _log_skipped(self, input_file: Path, model: torch.nn.Module, samples: int) -> float:
+        seconds = samples / model.samplerate
+        if seconds:
+            logger.info(f"Skipped inference on {seconds:.1f}s of silence in {input_file}")
+        return seconds
+
+    def _write_stems(self, input_file: Path, model: torch.nn.Module, sources: Dict[str, torch.Tensor]) -> ProcessingResult:
+        output_dir = self._output_dir(input_file)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        # Written aside and renamed, so readers only ever see complete stems
+        for name, source in sources.items():
+            stem_path = self._stem_path(output_dir, name)
+            stem_path.parent.mkdir(parents=True, exist_ok=True)
+            save_audio(source, str(partial_path(stem_path)), samplerate=model.samplerate)
+            os.replace(partial_path(stem_path), stem_path)
+
+        return self._collect_result(input_file, output_dir)
+
+    def _collect_result(self, input_file: Path, output_dir: Path) -> ProcessingResult:
+        stems = {}
+        for stem in self.config.processing.stems:
+            stem_path = self._stem_path(output_dir, stem)
+            if stem_path.exists():
+                stems[stem] = stem_path
+
+        return ProcessingResult(
+            input_file=input_file,
+            output_dir=output_dir,
+            stems=stems,
+            separator_used=SeparatorType.DEMUCS
+        )
+
     async def _process_spleeter(self, input_file: Path) -> ProcessingResult:
         # Implementation for Spleeter
         # TODO: Implement Spleeter processing
         pass
+
+# Per-process state of PooledProcessor workers
+_worker_processor: Optional[Processor] = None
+
+# Shortest wait between polls of the worker progress queue, so a
+# progress_interval of 0 does not spin the event loop
+_MIN_PROGRESS_POLL = 0.05
+
+def _init_worker(config, threads: int) -> None:
+    global _worker_processor
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    _worker_processor = Processor(config)
+    if config.demucs.warmup:
+        _worker_processor.warm_up()
+    logger.info(f"Separation worker {os.getpid()} started with {threads} threads")
+
+def _run_in_worker(input_files: List[Path], progress_queue=None) -> List[ProcessingResult]:
+    progress = progress_queue.put if progress_queue is not None else None
+    return asyncio.run(_worker_processor.process_batch(input_files, progress))
+
+def _preview_in_worker(input_file: Path) -> ProcessingResult:
+    return _worker_processor._separate_preview(input_file)
+
+def _wait_for_workers(barrier) -> int:
+    # A worker only takes tasks once its initializer has run, and holds this
+    # one until every worker has taken one, so all of them are warm
+    barrier.wait()
+    return os.getpid()
+
+class PooledProcessor(Processor):
+    """Runs separation in ``demucs.workers`` separate processes.
+
+    Each worker pins torch to ``demucs.threads_per_worker`` intra-op threads
+    (by default the CPU count split evenly between workers) and keeps its
+    own resident model, which scales better on many-core CPU hosts than a
+    single process with torch's default threading.
+    """
+
+    def __init__(self, config, executor: Optional[Executor] = None):
+        super().__init__(config)
+        self.workers = max(config.demucs.workers, 1)
+        self.threads_per_worker = (
+            config.demucs.threads_per_worker
+            or max((os.cpu_count() or 1) // self.workers, 1)
+        )
+        if executor is None:
+            executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(config, self.threads_per_worker)
+            )
+        self._executor = executor
+        self._manager = None
+
+    @property
+    def concurrency(self) -> int:
+        return self.workers
+
+    async def process_file(self, input_file: Path, progress: Optional[ProgressCallback] = None) -> ProcessingResult:
+        results = await self._dispatch([input_file], progress)
+        return results[0]
+
+    async def process_batch(
+        self,
+        input_files: List[Path],
+        progress: Optional[ProgressCallback] = None
+    ) -> List[ProcessingResult]:
+        # Spread the files over the workers, each separating its share as one batch
+        shares = [input_files[index::self.workers] for index in range(self.workers)]
+        shares = [share for share in shares if share]
+        fractions = [0.0] * len(shares)
+
+        def share_progress(index: int) -> Optional[ProgressCallback]:
+            if progress is None:
+                return None
+
+            def report(fraction: float) -> None:
+                fractions[index] = fraction
+                progress(sum(f * len(share) for f, share in zip(fractions, shares)) / len(input_files))
+            return report
+
+        outputs = await asyncio.gather(*(
+            self._dispatch(share, share_progress(index)) for index, share in enumerate(shares)
+        ))
+
+        by_file = {}
+        for share, results in zip(shares, outputs):
+            by_file.update(zip(share, results))
+        return [by_file[input_file] for input_file in input_files]
+
+    async def _process_preview(self, input_file: Path) -> ProcessingResult:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, _preview_in_worker, input_file)
+
+    async def _dispatch(
+        self,
+        input_files: List[Path],
+        progress: Optional[ProgressCallback] = None
+    ) -> List[ProcessingResult]:
+        loop = asyncio.get_running_loop()
+        if progress is None:
+            return await loop.run_in_executor(self._executor, _run_in_worker, input_files)
+
+        # Workers push (already throttled) progress through a manager queue
+        progress_queue = self._progress_queue()
+        future = loop.run_in_executor(self._executor, _run_in_worker, input_files, progress_queue)
+        interval = max(self.config.processing.progress_interval, _MIN_PROGRESS_POLL)
+        while not future.done():
+            await asyncio.wait({future}, timeout=interval)
+            while not progress_queue.empty():
+                progress(progress_queue.get_nowait())
+        return await future
+
+    def _get_manager(self):
+        if self._manager is None:
+            self._manager = multiprocessing.get_context("spawn").Manager()
+        return self._manager
+
+    def _progress_queue(self):
+        return self._get_manager().Queue()
+
+    def _barrier(self, parties: int):
+        return self._get_manager().Barrier(parties)
+
+    def warm_up(self) -> None:
+        """Start the worker processes and wait until every one has warmed up"""
+        barrier = self._barrier(self.workers)
+        futures = [self._executor.submit(_wait_for_workers, barrier) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        if self._manager is not None:
+            self._manager.shutdown()
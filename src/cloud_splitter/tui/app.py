@@ -9,6 +9,7 @@ from textual.css.query import NoMatches
 import tomli_w
 
 from cloud_splitter.core.config_loader import ConfigLoader
+from cloud_splitter.core.workflow import ProcessingWorkflow
 from cloud_splitter.config import Config
 from .download_view import DownloadView
 from .config_view import ConfigView
@@ -28,7 +29,7 @@ class CloudSplitterApp(App):
         Binding("q", "quit", "Quit"),
     ]
 
-    config: reactive[Config] = reactive(ConfigLoader.load_config())
+    config: reactive[Config] = reactive(ConfigLoader.load_or_default())
 
     def compose(self) -> ComposeResult:
         yield Header()
@@ -42,6 +43,22 @@ class CloudSplitterApp(App):
         """Handle application startup"""
         self.action_switch_view("download")
         self._update_status()
+        self.workflow = ProcessingWorkflow(self.config)
+        self.run_worker(self._warm_up_model(), group="warmup")
+
+    def on_unmount(self) -> None:
+        """Release the workflow's worker processes and queue database"""
+        self.workflow.close()
+
+    async def _warm_up_model(self) -> None:
+        """Warm the workflow's separation model without blocking the UI"""
+        warmup = self.workflow.warmup
+        if not warmup.enabled:
+            return
+        if await warmup.start():
+            self.notify("Separation model ready", severity="information")
+        else:
+            self.notify(f"Model warm-up failed: {warmup.error}", severity="error")
 
     def action_switch_view(self, view_name: str) -> None:
         """Switch between different views
@@ -4,7 +4,7 @@ from textual.reactive import reactive
 from typing import List, Dict
 from datetime import datetime
 from cloud_splitter.utils.queue import QueueItem
-from cloud_splitter.utils.status import ProcessStatus
+from cloud_splitter.utils.status import ProcessStatus, format_eta, format_rate
 
 class StatusView(Container):
     display = reactive(False)
@@ -28,6 +28,8 @@ class StatusView(Container):
             "URL",
             "Status",
             "Progress",
+            "Speed",
+            "ETA",
             "Duration",
             "Error"
         )
@@ -47,6 +49,8 @@ class StatusView(Container):
                 item.url,
                 item.status,
                 f"{item.progress:.1f}%",
+                format_rate(item.speed),
+                format_eta(item.eta),
                 duration,
                 item.error or ""
             )
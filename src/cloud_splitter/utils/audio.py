@@ -0,0 +1,67 @@
+"""
+Audio decoding shared by the pipeline stages
+"""
+from typing import Iterator, Optional
+from pathlib import Path
+import os
+import subprocess
+import tempfile
+import numpy as np
+from cloud_splitter.utils.cache import DecodedAudioCache, write_npy_chunks
+
+def decode_chunks(
+    path: Path,
+    samplerate: int,
+    channels: int,
+    chunk_frames: int = 1 << 18
+) -> Iterator[np.ndarray]:
+    """Decode ``path`` with ffmpeg into float32 ``(frames, channels)`` chunks.
+
+    The whole file is decoded in one ffmpeg run and handed over a block at a
+    time, so it never has to fit in memory.
+    """
+    process = subprocess.Popen(
+        [
+            "ffmpeg", "-v", "error", "-nostdin", "-i", str(path),
+            "-map", "0:a:0", "-ac", str(channels), "-ar", str(samplerate),
+            "-f", "f32le", "-"
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    frame_bytes = 4 * channels
+    try:
+        while True:
+            data = process.stdout.read(chunk_frames * frame_bytes)
+            if not data:
+                break
+            data = data[:len(data) - len(data) % frame_bytes]
+            yield np.frombuffer(data, dtype="<f4").reshape(-1, channels)
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read()
+        process.stderr.close()
+        process.wait()
+    if process.returncode != 0:
+        raise RuntimeError(
+            f"Decoding {path} failed: {stderr.decode(errors='replace').strip()}"
+        )
+
+def load_decoded(
+    path: Path,
+    samplerate: int,
+    channels: int,
+    cache: Optional[DecodedAudioCache] = None
+) -> np.ndarray:
+    """Decoded ``(frames, channels)`` audio of ``path``, memory-mapped from ``cache`` if given"""
+    if cache is None:
+        # Spool to a scratch file and map it: concatenating the chunks would
+        # hold the whole decode in memory twice
+        fd, scratch = tempfile.mkstemp(suffix=".npy")
+        os.close(fd)
+        try:
+            write_npy_chunks(Path(scratch), decode_chunks(path, samplerate, channels), channels)
+            return np.load(scratch, mmap_mode="c")
+        finally:
+            os.unlink(scratch)
+    return cache.load(path, samplerate, channels, lambda: decode_chunks(path, samplerate, channels))
@@ -0,0 +1,330 @@
+"""
+On-disk caches for Cloud Splitter
+"""
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
+from pathlib import Path
+import hashlib
+import json
+import os
+import re
+import shutil
+import struct
+import threading
+import uuid
+import numpy as np
+from cloud_splitter.utils.logging import get_logger
+
+logger = get_logger()
+
+def link_or_copy(source: Path, target: Path) -> None:
+    """Hardlink ``source`` to ``target``, copying when linking is not possible.
+
+    The link is made beside ``target`` and renamed over it, so an existing
+    file at ``target`` is replaced atomically.
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    scratch = target.with_name(f".{target.name}.{uuid.uuid4().hex}")
+    try:
+        os.link(source, scratch)
+    except OSError:
+        shutil.copy2(source, scratch)
+    os.replace(scratch, target)
+
+def partial_path(path: Path) -> Path:
+    """Scratch file an output is written to before being renamed into place"""
+    return path.with_name(f".{path.stem}.partial{path.suffix}")
+
+class DiskLRUCache:
+    """Directory of cache entries bounded to ``max_bytes`` in total.
+
+    Each entry is a sub-directory named after its key. An entry's mtime is
+    refreshed on every hit, and once the cache grows past ``max_bytes`` the
+    least recently used entries are deleted. Entries are assembled in a
+    temporary directory and renamed into place, so readers never see a
+    partially written entry.
+
+    The total size is scanned once on startup and then kept up to date on
+    every put, so the directory is only walked again when an eviction is
+    due.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root).expanduser()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._total = sum(size for _, size, _ in self._entries())
+
+    def entry_path(self, key: str) -> Path:
+        return self.root / key
+
+    def get(self, key: str) -> Optional[Path]:
+        """Return the entry directory for ``key``, or None on a miss"""
+        path = self.entry_path(key)
+        with self._lock:
+            if path.is_dir():
+                self.hits += 1
+                os.utime(path)
+                return path
+            self.misses += 1
+            return None
+
+    def put(self, key: str, files: Dict[str, Path]) -> Optional[Path]:
+        """Store ``files`` under ``key`` as ``<name><suffix>``, linking where possible.
+
+        An entry larger than ``max_bytes`` would evict everything, itself
+        included, so it is not stored and None is returned.
+        """
+        staging = self.root / f".tmp-{uuid.uuid4().hex}"
+        staging.mkdir()
+        try:
+            for name, source in files.items():
+                link_or_copy(source, staging / f"{name}{source.suffix}")
+            size = self._size(staging)
+            if size > self.max_bytes:
+                logger.debug(f"Not caching {key}: {size} bytes is over the {self.max_bytes} byte limit")
+                return None
+
+            path = self.entry_path(key)
+            with self._lock:
+                if path.exists():
+                    self._total -= self._size(path)
+                    shutil.rmtree(path)
+                os.replace(staging, path)
+                self._total += size
+                if self._total > self.max_bytes:
+                    self._evict()
+            return path
+        finally:
+            if staging.exists():
+                shutil.rmtree(staging, ignore_errors=True)
+
+    @staticmethod
+    def _size(path: Path) -> int:
+        return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+    def _entries(self) -> List[Tuple[float, int, Path]]:
+        entries = []
+        for path in self.root.iterdir():
+            if not path.is_dir() or path.name.startswith(".tmp-"):
+                continue
+            entries.append((path.stat().st_mtime, self._size(path), path))
+        return entries
+
+    def _evict(self) -> None:
+        # Rescan rather than trust the running total, which other processes
+        # sharing the directory may have made stale
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            logger.debug(f"Evicted cache entry {path.name}")
+        self._total = total
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+        }
+
+class SeparationCache:
+    """Separated stems keyed by the decoded audio and the separation settings.
+
+    Each entry also keeps a small JSON file of facts about the separation,
+    such as how much silence it skipped, that a hit has to report again.
+    """
+
+    METADATA = "separation.json"
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.store = DiskLRUCache(root, max_bytes)
+
+    @staticmethod
+    def key(pcm_chunks: Iterable[Any], model: str, shifts: int, stems: Iterable[str]) -> str:
+        """Hash bytes-like PCM chunks together with the separation settings"""
+        digest = hashlib.sha256()
+        for chunk in pcm_chunks:
+            digest.update(chunk)
+        digest.update(f"|{model}|{shifts}|{','.join(sorted(stems))}".encode())
+        return digest.hexdigest()
+
+    def lookup(self, key: str) -> Optional[Tuple[Dict[str, Path], Dict[str, Any]]]:
+        """Return cached stem files by stem name and their metadata, or None on a miss"""
+        path = self.store.get(key)
+        if path is None:
+            return None
+        stems = {
+            stem.stem: stem for stem in path.iterdir()
+            if stem.is_file() and stem.name != self.METADATA
+        }
+        metadata_path = path / self.METADATA
+        metadata = json.loads(metadata_path.read_text()) if metadata_path.exists() else {}
+        return stems, metadata
+
+    def store_stems(self, key: str, stems: Dict[str, Path], metadata: Optional[Dict[str, Any]] = None) -> None:
+        scratch = self.store.root / f".tmp-{uuid.uuid4().hex}.json"
+        try:
+            scratch.write_text(json.dumps(metadata or {}))
+            self.store.put(key, {**stems, Path(self.METADATA).stem: scratch})
+        finally:
+            scratch.unlink(missing_ok=True)
+
+    @property
+    def hits(self) -> int:
+        return self.store.hits
+
+    @property
+    def misses(self) -> int:
+        return self.store.misses
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats
+
+class MediaCache:
+    """Downloaded media keyed by extractor, video ID and requested format.
+
+    Reprocessing a track with another model or stem set reuses the file
+    instead of fetching it again. Entries are hardlinked in and out where
+    the filesystem allows, so deleting a downloaded file never touches the
+    cached copy.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.store = DiskLRUCache(root, max_bytes)
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(extractor: str, video_id: str, media_format: str) -> str:
+        fmt = hashlib.sha256(media_format.encode()).hexdigest()[:16]
+        return re.sub(r"[^\w.-]", "_", f"{extractor}-{video_id}") + f"-{fmt}"
+
+    def lookup(self, key: str) -> Optional[Path]:
+        """Return the cached media file for ``key``, or None on a miss"""
+        path = self.store.get(key)
+        if path is None:
+            return None
+        media = next((f for f in path.iterdir() if f.is_file()), None)
+        if media is None:
+            return None
+        with self._lock:
+            self.bytes_saved += media.stat().st_size
+        return media
+
+    def store_file(self, key: str, media: Path) -> None:
+        self.store.put(key, {"media": media})
+
+    @property
+    def hits(self) -> int:
+        return self.store.hits
+
+    @property
+    def misses(self) -> int:
+        return self.store.misses
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {**self.store.stats, "bytes_saved": self.bytes_saved}
+
+# Room for the .npy header of any (frames, channels) shape, so the header
+# can be rewritten in place once decoding has finished
+_NPY_HEADER_SIZE = 128
+
+def _npy_header(shape: Tuple[int, int]) -> bytes:
+    header = repr({"descr": "<f4", "fortran_order": False, "shape": shape}).encode("latin1")
+    header += b" " * (_NPY_HEADER_SIZE - 10 - len(header) - 1) + b"\n"
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header
+
+def write_npy_chunks(path: Path, chunks: Iterable[np.ndarray], channels: int) -> int:
+    """Stream ``(frames, channels)`` float32 chunks into a ``.npy`` file.
+
+    The frame count is unknown until the last chunk, so a fixed-size header
+    is reserved up front and filled in at the end. Returns the frame count.
+    """
+    frames = 0
+    with open(path, "wb") as f:
+        f.write(bytes(_NPY_HEADER_SIZE))
+        for chunk in chunks:
+            chunk = np.ascontiguousarray(chunk, dtype="<f4").reshape(-1, channels)
+            f.write(chunk.data)
+            frames += len(chunk)
+        f.seek(0)
+        f.write(_npy_header((frames, channels)))
+    return frames
+
+class DecodedAudioCache:
+    """Decoded float32 PCM shared by every stage that reads an input file.
+
+    Entries hold one ``audio.npy`` of shape ``(frames, channels)`` at the
+    requested sample rate, keyed by the source file's path, size and mtime.
+    They are memory-mapped copy-on-write on every read, so separation,
+    analysis and previews share a single decode through the page cache.
+    """
+
+    FILENAME = "audio.npy"
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.store = DiskLRUCache(root, max_bytes)
+
+    @staticmethod
+    def key(path: Path, samplerate: int, channels: int) -> str:
+        path = Path(path).expanduser().resolve()
+        stat = path.stat()
+        identity = f"{path}|{stat.st_size}|{stat.st_mtime_ns}|{samplerate}|{channels}"
+        return hashlib.sha256(identity.encode()).hexdigest()
+
+    def get(self, path: Path, samplerate: int, channels: int) -> Optional[np.ndarray]:
+        """Memory-map the decoded audio of ``path``, or return None on a miss"""
+        entry = self.store.get(self.key(path, samplerate, channels))
+        if entry is None:
+            return None
+        return np.load(entry / self.FILENAME, mmap_mode="c")
+
+    def put(
+        self,
+        path: Path,
+        samplerate: int,
+        channels: int,
+        chunks: Iterable[np.ndarray]
+    ) -> np.ndarray:
+        """Write decoded ``chunks`` for ``path`` and return the memory-mapped entry"""
+        key = self.key(path, samplerate, channels)
+        scratch = self.store.root / f".tmp-{uuid.uuid4().hex}.npy"
+        try:
+            frames = write_npy_chunks(scratch, chunks, channels)
+            # Map before storing: the mapping outlives the scratch file, which
+            # is all there is of a decode too large to cache
+            audio = np.load(scratch, mmap_mode="c")
+            self.store.put(key, {"audio": scratch})
+        finally:
+            scratch.unlink(missing_ok=True)
+        logger.debug(f"Cached {frames} decoded frames of {path}")
+        return audio
+
+    def load(
+        self,
+        path: Path,
+        samplerate: int,
+        channels: int,
+        decode: Callable[[], Iterable[np.ndarray]]
+    ) -> np.ndarray:
+        """Return the cached audio of ``path``, decoding it with ``decode`` on a miss"""
+        audio = self.get(path, samplerate, channels)
+        if audio is None:
+            audio = self.put(path, samplerate, channels, decode())
+        return audio
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats
@@ -0,0 +1,112 @@
+"""
+Resumable separation checkpoints
+"""
+from typing import Dict, Any, Optional
+from pathlib import Path
+import json
+import os
+import shutil
+import time
+import uuid
+import torch
+from cloud_splitter.utils.logging import get_logger
+
+logger = get_logger()
+
+class SeparationCheckpoint:
+    """Scratch directory holding the completed part of one streamed separation.
+
+    Besides the raw stem files appended by the processor it keeps
+    ``manifest.json``, describing how far the separation got, and
+    ``tail.pt``, the look-ahead audio that is crossfaded into the next
+    window. Both are replaced atomically after the stem files are synced,
+    so the manifest never claims more audio than is on disk.
+    """
+
+    MANIFEST = "manifest.json"
+    TAIL = "tail.pt"
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory).expanduser()
+
+    def stem_file(self, name: str) -> Path:
+        return self.directory / f"{name}.pcm"
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """Return the saved manifest, or None if there is nothing to resume"""
+        try:
+            with open(self.directory / self.MANIFEST) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load_tail(self) -> Optional[Dict[str, torch.Tensor]]:
+        path = self.directory / self.TAIL
+        if not path.exists():
+            return None
+        return torch.load(path)
+
+    def save(self, state: Dict[str, Any], tail: Optional[Dict[str, torch.Tensor]]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if tail is not None:
+            self._replace(self.TAIL, lambda path: torch.save(tail, path))
+        self._replace(self.MANIFEST, lambda path: path.write_text(json.dumps(state)))
+
+    def _replace(self, name: str, write) -> None:
+        scratch = self.directory / f".{name}.{uuid.uuid4().hex}"
+        write(scratch)
+        os.replace(scratch, self.directory / name)
+
+    def clear(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+def prune_checkpoints(root: Path, max_age: float) -> int:
+    """Delete checkpoints under ``root`` untouched for ``max_age`` seconds"""
+    root = Path(root).expanduser()
+    if not root.is_dir():
+        return 0
+    cutoff = time.time() - max_age
+    pruned = 0
+    for directory in root.iterdir():
+        if directory.is_dir() and directory.stat().st_mtime < cutoff:
+            shutil.rmtree(directory, ignore_errors=True)
+            pruned += 1
+    if pruned:
+        logger.info(f"Removed {pruned} abandoned separation checkpoints")
+    return pruned
+
+class ResumeIndex:
+    """Downloads whose separation has not finished yet, keyed by URL.
+
+    A queued URL found here is not downloaded again: the file is still on
+    disk and its separation resumes from the processor's checkpoint.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path).expanduser()
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _store(self, entries: Dict[str, Any]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        scratch = self.path.with_name(f".{self.path.name}.{uuid.uuid4().hex}")
+        scratch.write_text(json.dumps(entries))
+        os.replace(scratch, self.path)
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        return self._load().get(url)
+
+    def put(self, url: str, entry: Dict[str, Any]) -> None:
+        entries = self._load()
+        entries[url] = entry
+        self._store(entries)
+
+    def discard(self, url: str) -> None:
+        entries = self._load()
+        if entries.pop(url, None) is not None:
+            self._store(entries)
@@ -1,82 +1,356 @@
-from typing import List, Optional, Dict, Any
-from dataclasses import dataclass
+from typing import Deque, Iterable, List, Optional, Dict, Any, Tuple, Union
+from collections import Counter, deque
 from datetime import datetime
+from enum import Enum
+from pathlib import Path
 import asyncio
+import heapq
+import itertools
+import json
+import math
+import sqlite3
+import time
 from cloud_splitter.utils.logging import get_logger
 
 logger = get_logger()
 
-@dataclass
+class SchedulingPolicy(str, Enum):
+    FIFO = "fifo"
+    # Shortest job first, by the duration recorded in the item metadata
+    SJF = "sjf"
+    # Highest priority first, raised the longer an item waits
+    PRIORITY = "priority"
+
 class QueueItem:
-    url: str
-    status: str = "pending"
-    progress: float = 0.0
-    error: Optional[str] = None
-    start_time: Optional[datetime] = None
-    end_time: Optional[datetime] = None
-    metadata: Dict[str, Any] = None
-
-    def __post_init__(self):
-        if self.metadata is None:
-            self.metadata = {}
+    """One queued URL.
+
+    Slotted, since a channel backfill can queue tens of thousands of them.
+    Change ``status`` through the ``ProcessingQueue`` methods only, which
+    keep the queue's indexes and counters in step.
+    """
+
+    __slots__ = (
+        "url", "status", "progress", "error", "start_time", "end_time", "metadata",
+        "speed", "eta", "priority", "queued_time", "_order", "_ticket",
+    )
+
+    def __init__(
+        self,
+        url: str,
+        status: str = "pending",
+        progress: float = 0.0,
+        error: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        speed: Optional[float] = None,
+        eta: Optional[float] = None,
+        priority: float = 0.0,
+        queued_time: Optional[datetime] = None
+    ):
+        self.url = url
+        self.status = status
+        self.progress = progress
+        self.error = error
+        self.start_time = start_time
+        self.end_time = end_time
+        self.metadata = metadata if metadata is not None else {}
+        # Transfer rate in bytes per second and seconds left while downloading
+        self.speed = speed
+        self.eta = eta
+        self.priority = priority
+        self.queued_time = queued_time if queued_time is not None else datetime.now()
+        # Position in the queue, and the current entry in the pending index
+        self._order = 0
+        self._ticket = 0
+
+    def __repr__(self) -> str:
+        return f"QueueItem(url={self.url!r}, status={self.status!r}, progress={self.progress})"
+
+# Dirty items that force a write before the flush interval is up
+_FLUSH_BATCH = 256
+
+class QueueStore:
+    """SQLite database, in WAL mode, that a ``ProcessingQueue`` persists its items to"""
+
+    COLUMNS = (
+        "id", "url", "status", "progress", "error", "start_time", "end_time",
+        "metadata", "priority", "queued_time",
+    )
+
+    def __init__(self, path: Path):
+        path = Path(path).expanduser()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(path), check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # Durable at every checkpoint rather than every commit; WAL keeps it consistent
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS queue_items ("
+            "id INTEGER PRIMARY KEY, url TEXT NOT NULL, status TEXT NOT NULL, "
+            "progress REAL NOT NULL, error TEXT, start_time TEXT, end_time TEXT, "
+            "metadata TEXT NOT NULL, priority REAL NOT NULL, queued_time TEXT NOT NULL)"
+        )
+        self.connection.commit()
+
+    def recover(self) -> List[QueueItem]:
+        """Unfinished items of earlier runs, in queue order.
+
+        Items that finished are dropped, and items left "processing" by a
+        crash are pending again.
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM queue_items WHERE status IN ('complete', 'failed')")
+            self.connection.execute(
+                "UPDATE queue_items SET status = 'pending', progress = 0, start_time = NULL "
+                "WHERE status != 'pending'"
+            )
+        rows = self.connection.execute(
+            f"SELECT {', '.join(self.COLUMNS)} FROM queue_items ORDER BY id"
+        ).fetchall()
+        items = []
+        for row in rows:
+            record = dict(zip(self.COLUMNS, row))
+            item = QueueItem(
+                url=record["url"],
+                status=record["status"],
+                progress=record["progress"],
+                error=record["error"],
+                metadata=json.loads(record["metadata"]),
+                priority=record["priority"],
+                queued_time=datetime.fromisoformat(record["queued_time"])
+            )
+            item._order = record["id"]
+            items.append(item)
+        return items
+
+    def save(self, items: Iterable[QueueItem]) -> None:
+        """Write ``items`` in one transaction"""
+        rows = [
+            (
+                item._order, item.url, item.status, item.progress, item.error,
+                item.start_time.isoformat() if item.start_time else None,
+                item.end_time.isoformat() if item.end_time else None,
+                json.dumps(item.metadata, default=str), item.priority, item.queued_time.isoformat(),
+            )
+            for item in items
+        ]
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO queue_items ({', '.join(self.COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                rows
+            )
+
+    def close(self) -> None:
+        self.connection.close()
 
 class ProcessingQueue:
-    def __init__(self):
+    """Queued URLs handed out by ``policy``.
+
+    With the priority policy an item's priority rises by ``aging`` for every
+    minute it waits, so low priority items are not starved.
+
+    Every operation is O(1) or O(log n) in the queue length: items are
+    indexed by URL, status counts are kept up to date as items move, and
+    pending items sit in a deque (FIFO) or a heap (other policies). Index
+    entries for items that have since changed are dropped lazily when they
+    reach the front.
+
+    With a ``store`` the queue survives restarts: unfinished items of an
+    earlier run are queued again on startup. Changed items are written in
+    one transaction once ``_FLUSH_BATCH`` of them pile up or
+    ``flush_interval`` seconds have passed, and on ``flush``. A transition
+    lost to a crash at worst runs an item again.
+    """
+
+    def __init__(
+        self,
+        policy: SchedulingPolicy = SchedulingPolicy.FIFO,
+        aging: float = 1.0,
+        store: Optional[QueueStore] = None,
+        flush_interval: float = 1.0
+    ):
         self.items: List[QueueItem] = []
+        self.policy = SchedulingPolicy(policy)
+        self.aging = aging
         self._lock = asyncio.Lock()
         self._current_item: Optional[QueueItem] = None
+        self._index: Dict[str, QueueItem] = {}
+        self._counts: Counter = Counter()
+        self._pending: Union[Deque[Tuple[int, QueueItem]], List[Tuple[float, int, int, QueueItem]]] = (
+            deque() if self.policy == SchedulingPolicy.FIFO else []
+        )
+        self._tickets = itertools.count(1)
+        self._orders = itertools.count()
+        self.store = store
+        self.flush_interval = flush_interval
+        self._dirty: Dict[int, QueueItem] = {}
+        self._last_flush = time.monotonic()
+        if store is not None:
+            recovered = store.recover()
+            for item in recovered:
+                self._insert(item)
+            if recovered:
+                self._orders = itertools.count(recovered[-1]._order + 1)
+                logger.info(f"Recovered {len(recovered)} unfinished queue items")
 
-    async def add_item(self, url: str) -> QueueItem:
+    async def add_item(
+        self,
+        url: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        priority: float = 0.0
+    ) -> QueueItem:
+        """Queue ``url``, or return its item if it is already pending or processing"""
         async with self._lock:
-            item = QueueItem(url=url)
-            self.items.append(item)
+            queued = self._index.get(url)
+            if queued is not None and queued.status in ("pending", "processing"):
+                logger.debug(f"URL already queued: {url}")
+                return queued
+            item = QueueItem(url=url, metadata=metadata, priority=priority, queued_time=datetime.now())
+            item._order = next(self._orders)
+            self._insert(item)
+            self._touch(item)
             logger.info(f"Added URL to queue: {url}")
             return item
 
-    async def add_items(self, urls: List[str]) -> List[QueueItem]:
-        return [await self.add_item(url) for url in urls]
+    def _insert(self, item: QueueItem) -> None:
+        self.items.append(item)
+        # Updates by URL go to the latest item queued for it
+        self._index[item.url] = item
+        self._counts[item.status] += 1
+        if item.status == "pending":
+            self._push(item)
+
+    async def add_items(self, urls: List[str], priority: float = 0.0) -> List[QueueItem]:
+        return [await self.add_item(url, priority=priority) for url in urls]
 
     async def get_next_item(self) -> Optional[QueueItem]:
         async with self._lock:
-            pending_items = [item for item in self.items if item.status == "pending"]
-            if pending_items:
-                self._current_item = pending_items[0]
-                self._current_item.status = "processing"
-                self._current_item.start_time = datetime.now()
-                logger.info(f"Processing URL: {self._current_item.url}")
-                return self._current_item
+            item = self._pop_pending()
+            if item is not None:
+                self._current_item = item
+                self._set_status(item, "processing")
+                item.start_time = datetime.now()
+                self._touch(item)
+                logger.info(f"Processing URL: {item.url}")
+                return item
             return None
 
-    async def update_progress(self, url: str, progress: float, status: str = "processing"):
+    def _touch(self, item: QueueItem) -> None:
+        """Mark ``item`` for the next write, flushing when a batch is due"""
+        if self.store is None:
+            return
+        self._dirty[item._order] = item
+        if len(self._dirty) >= _FLUSH_BATCH or time.monotonic() - self._last_flush >= self.flush_interval:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._dirty:
+            self.store.save(self._dirty.values())
+            self._dirty.clear()
+        self._last_flush = time.monotonic()
+
+    async def flush(self) -> None:
+        """Write every pending change to the store"""
+        async with self._lock:
+            if self.store is not None:
+                self._flush()
+
+    def close(self) -> None:
+        if self.store is not None:
+            self._flush()
+            self.store.close()
+            self.store = None
+
+    def _push(self, item: QueueItem) -> None:
+        """Add a pending ``item`` to the pending index, superseding any earlier entry"""
+        item._ticket = next(self._tickets)
+        if self.policy == SchedulingPolicy.FIFO:
+            self._pending.append((item._ticket, item))
+        else:
+            heapq.heappush(self._pending, (self._sort_key(item), item._order, item._ticket, item))
+
+    def _pop_pending(self) -> Optional[QueueItem]:
+        while self._pending:
+            if self.policy == SchedulingPolicy.FIFO:
+                ticket, item = self._pending.popleft()
+            else:
+                _, _, ticket, item = heapq.heappop(self._pending)
+            # Skip entries for items that left pending or were re-indexed
+            if item.status == "pending" and item._ticket == ticket:
+                return item
+        return None
+
+    def _sort_key(self, item: QueueItem) -> float:
+        # Ties fall back to queue order
+        if self.policy == SchedulingPolicy.SJF:
+            # Items whose duration is not known yet go after every known one
+            return item.metadata.get("duration") or math.inf
+        # priority + aging * minutes waited, less the "now" term every item shares
+        return -(item.priority - self.aging * item.queued_time.timestamp() / 60)
+
+    def _set_status(self, item: QueueItem, status: str) -> None:
+        if item.status == status:
+            return
+        self._counts[item.status] -= 1
+        self._counts[status] += 1
+        item.status = status
+        if status == "pending":
+            self._push(item)
+
+    async def update_metadata(self, url: str, metadata: Dict[str, Any]):
+        """Merge prefetched ``metadata`` such as duration into the item for ``url``"""
+        async with self._lock:
+            item = self._find_item(url)
+            if item:
+                item.metadata.update(metadata)
+                if item.status == "pending" and self.policy == SchedulingPolicy.SJF:
+                    self._push(item)
+                self._touch(item)
+
+    async def update_progress(
+        self,
+        url: str,
+        progress: float,
+        status: str = "processing",
+        speed: Optional[float] = None,
+        eta: Optional[float] = None
+    ):
         async with self._lock:
             item = self._find_item(url)
             if item:
                 item.progress = progress
-                item.status = status
+                self._set_status(item, status)
+                item.speed = speed
+                item.eta = eta
+                self._touch(item)
                 logger.debug(f"Updated progress for {url}: {progress:.1f}%")
 
     async def mark_complete(self, url: str, metadata: Optional[Dict[str, Any]] = None):
         async with self._lock:
             item = self._find_item(url)
             if item:
-                item.status = "complete"
+                self._set_status(item, "complete")
                 item.progress = 100.0
                 item.end_time = datetime.now()
                 if metadata:
                     item.metadata = metadata
+                self._touch(item)
                 logger.info(f"Completed processing URL: {url}")
 
     async def mark_failed(self, url: str, error: str):
         async with self._lock:
             item = self._find_item(url)
             if item:
-                item.status = "failed"
+                self._set_status(item, "failed")
                 item.error = error
                 item.end_time = datetime.now()
+                self._touch(item)
                 logger.error(f"Failed processing URL: {url} - {error}")
 
     def _find_item(self, url: str) -> Optional[QueueItem]:
-        return next((item for item in self.items if item.url == url), None)
+        return self._index.get(url)
 
     @property
     def current_item(self) -> Optional[QueueItem]:
@@ -90,8 +364,7 @@ class ProcessingQueue:
             "complete": 0,
             "failed": 0
         }
-        for item in self.items:
-            status_count[item.status] = status_count.get(item.status, 0) + 1
+        status_count.update((status, count) for status, count in self._counts.items() if count)
         return status_count
 
     @property
@@ -100,4 +373,4 @@ class ProcessingQueue:
 
     @property
     def has_pending(self) -> bool:
-        return any(item.status == "pending" for item in self.items)
+        return self._counts["pending"] > 0
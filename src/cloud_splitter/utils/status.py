@@ -1,6 +1,8 @@
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Callable
 from dataclasses import dataclass
 from datetime import datetime
+import asyncio
+import time
 from cloud_splitter.utils.logging import get_logger
 
 logger = get_logger()
@@ -28,6 +30,87 @@ class ProcessStatus:
             return (self.end_time - self.start_time).total_seconds()
         return None
 
+def format_rate(speed: Optional[float]) -> str:
+    """Human readable transfer rate for ``speed`` bytes per second"""
+    if not speed:
+        return ""
+    for unit in ("B/s", "KiB/s", "MiB/s"):
+        if speed < 1024:
+            return f"{speed:.1f} {unit}"
+        speed /= 1024
+    return f"{speed:.1f} GiB/s"
+
+def format_eta(eta: Optional[float]) -> str:
+    """``eta`` seconds as ``m:ss``"""
+    if eta is None:
+        return ""
+    minutes, seconds = divmod(int(eta), 60)
+    return f"{minutes}:{seconds:02d}"
+
+class ProgressThrottle:
+    """Forwards progress fractions to ``callback`` at most once per ``interval`` seconds.
+
+    Intermediate updates are dropped; completion (a fraction of 1.0) is
+    always forwarded so consumers see the final state. Keyword details such
+    as transfer speed are passed along with the fraction they came with.
+    """
+
+    def __init__(self, callback: Callable[..., None], interval: float = 0.5):
+        self.callback = callback
+        self.interval = interval
+        self._last_time: Optional[float] = None
+
+    def __call__(self, fraction: float, **details: Any) -> None:
+        now = time.monotonic()
+        if fraction < 1.0 and self._last_time is not None and now - self._last_time < self.interval:
+            return
+        self._last_time = now
+        self.callback(min(max(fraction, 0.0), 1.0), **details)
+
+class SlotPool:
+    """Semaphore of ``capacity`` slots that records how busy they were.
+
+    Use it as ``async with pool:``. ``stats`` reports the slots in use,
+    the peak, and utilisation: the fraction of slot-time spent busy since
+    the pool was created.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(capacity, 1)
+        self.in_use = 0
+        self.peak = 0
+        self._semaphore = asyncio.Semaphore(self.capacity)
+        self._busy = 0.0
+        self._started = self._changed = time.monotonic()
+
+    def _account(self) -> float:
+        now = time.monotonic()
+        self._busy += self.in_use * (now - self._changed)
+        self._changed = now
+        return now
+
+    async def __aenter__(self) -> "SlotPool":
+        await self._semaphore.acquire()
+        self._account()
+        self.in_use += 1
+        self.peak = max(self.peak, self.in_use)
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._account()
+        self.in_use -= 1
+        self._semaphore.release()
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        elapsed = self._account() - self._started
+        return {
+            "capacity": self.capacity,
+            "in_use": self.in_use,
+            "peak": self.peak,
+            "utilisation": self._busy / (self.capacity * elapsed) if elapsed > 0 else 0.0,
+        }
+
 class StatusManager:
     def __init__(self):
         self.current_status: Optional[ProcessStatus] = None
@@ -44,6 +127,21 @@ class StatusManager:
         self.logger.info(f"{stage}: {status} ({progress:.1f}%) - {details or ''}")
         self._status_history.append(self.current_status)
 
+    def update_progress(self, stage: str, progress: float, details: Optional[str] = None):
+        """Move the running ``stage`` to ``progress`` in place.
+
+        Unlike ``update_status`` this keeps the stage's start time and adds
+        no history entry, so it can be called on every progress tick.
+        """
+        if self.current_status is None or self.current_status.stage != stage:
+            self.current_status = ProcessStatus(stage=stage, status="running", progress=progress, details=details)
+        else:
+            self.current_status.status = "running"
+            self.current_status.progress = progress
+            if details is not None:
+                self.current_status.details = details
+        self.logger.debug(f"{stage}: running ({progress:.1f}%) - {details or ''}")
+
     def mark_complete(self, stage: str, metadata: Optional[Dict[str, Any]] = None):
         if self.current_status and self.current_status.stage == stage:
             self.current_status.status = "complete"
@@ -0,0 +1,47 @@
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+from click.testing import CliRunner
+from cloud_splitter.cli import cli
+from cloud_splitter.config import Config
+from cloud_splitter.exceptions import ConfigurationError
+
+def test_process_runs_urls_through_a_closed_workflow(tmp_path):
+    urls = ["https://www.youtube.com/watch?v=test1", "https://www.youtube.com/watch?v=test2"]
+
+    with patch('cloud_splitter.cli.ConfigLoader.load_config', return_value=Config()), \
+            patch('cloud_splitter.cli.ProcessingWorkflow') as mock_workflow:
+        workflow = mock_workflow.return_value
+        workflow.add_urls = AsyncMock()
+        workflow.process_queue = AsyncMock(return_value=[{}, {}])
+        result = CliRunner().invoke(cli, ['process', *urls, '--output', str(tmp_path), '--no-keep'])
+
+    assert result.exit_code == 0, result.output
+    assert "Processed 2 tracks" in result.output
+    config = mock_workflow.call_args.args[0]
+    assert config.paths.output_dir == Path(tmp_path)
+    assert not config.download.keep_original
+    assert not config.processing.persistent_queue
+    workflow.add_urls.assert_awaited_once_with(urls)
+    workflow.close.assert_called_once()
+
+def test_process_closes_the_workflow_when_processing_fails():
+    with patch('cloud_splitter.cli.ConfigLoader.load_config', return_value=Config()), \
+            patch('cloud_splitter.cli.ProcessingWorkflow') as mock_workflow:
+        workflow = mock_workflow.return_value
+        workflow.add_urls = AsyncMock(side_effect=RuntimeError("boom"))
+        result = CliRunner().invoke(cli, ['process', 'https://www.youtube.com/watch?v=test1'])
+
+    assert result.exit_code != 0
+    workflow.close.assert_called_once()
+
+def test_process_falls_back_to_the_default_config():
+    error = ConfigurationError("no config file")
+    with patch('cloud_splitter.cli.ConfigLoader.load_config', side_effect=error), \
+            patch('cloud_splitter.cli.ProcessingWorkflow') as mock_workflow:
+        workflow = mock_workflow.return_value
+        workflow.add_urls = AsyncMock()
+        workflow.process_queue = AsyncMock(return_value=[{}])
+        result = CliRunner().invoke(cli, ['process', 'https://www.youtube.com/watch?v=test1'])
+
+    assert result.exit_code == 0, result.output
+    assert mock_workflow.call_args.args[0].demucs.model == Config().demucs.model
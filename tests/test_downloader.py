@@ -1,5 +1,8 @@
 import pytest
+import asyncio
+import threading
 from pathlib import Path
+import yt_dlp
 from cloud_splitter.downloader import Downloader, DownloadResult
 from unittest.mock import patch, MagicMock
 
@@ -8,15 +11,28 @@ def sample_config(temp_dir):
     class Config:
         class Download:
             format = "bestaudio/best"
+            audio_format = "wav"
             keep_original = True
             batch_enabled = True
+            concurrent_downloads = 2
+            prefetch_workers = 4
         
         class Paths:
             download_dir = temp_dir / "downloads"
             output_dir = temp_dir / "output"
+
+        class Cache:
+            enabled = False
+            media = True
+            media_max_size = 1024**2
+
+        class Processing:
+            progress_interval = 60.0
         
         download = Download()
         paths = Paths()
+        cache = Cache()
+        processing = Processing()
     
     return Config()
 
@@ -29,6 +45,15 @@ def test_downloader_initialization(downloader):
     assert 'format' in downloader.ydl_opts
     assert downloader.ydl_opts['format'] == 'bestaudio/best'
 
+def test_native_audio_format_skips_transcode(sample_config):
+    sample_config.download.audio_format = "native"
+    downloader = Downloader(sample_config)
+    assert downloader.ydl_opts['postprocessors'] == []
+
+    sample_config.download.audio_format = "flac"
+    downloader = Downloader(sample_config)
+    assert [pp['preferredcodec'] for pp in downloader.ydl_opts['postprocessors']] == ['flac']
+
 @pytest.mark.asyncio
 async def test_download_single_url(downloader, temp_dir):
     mock_info = {
@@ -72,11 +97,202 @@ async def test_batch_download(downloader):
     
     with patch('yt_dlp.YoutubeDL') as mock_ydl:
         instance = mock_ydl.return_value.__enter__.return_value
-        instance.extract_info.side_effect = [mock_info1, mock_info2]
+        infos = dict(zip(urls, [mock_info1, mock_info2]))
+        instance.extract_info.side_effect = lambda url, download: infos[url]
         
-        results = await downloader.batch_download(urls)
+        batch = await downloader.batch_download(urls)
+        results = batch.results
         
         assert len(results) == 2
+        assert batch.failures == {}
         assert all(isinstance(r, DownloadResult) for r in results)
         assert results[0].title == 'Test Song 1'
         assert results[1].title == 'Test Song 2'
+
+@pytest.mark.asyncio
+async def test_batch_download_is_bounded_and_collects_failures(downloader):
+    urls = [f'https://youtube.com/watch?v=test{index}' for index in range(6)]
+    lock = threading.Lock()
+    running = []
+    peak = []
+    both_running = threading.Event()
+
+    def extract_info(url, download):
+        with lock:
+            running.append(url)
+            peak.append(len(running))
+            if len(running) == 2:
+                both_running.set()
+        # Only returns once a second download is in flight, proving overlap
+        both_running.wait(timeout=5)
+        with lock:
+            running.remove(url)
+        if url.endswith('test3'):
+            raise Exception('HTTP Error 404')
+        return {
+            'title': url,
+            'requested_downloads': [{'filepath': 'test.mp3'}],
+            'vcodec': 'none'
+        }
+
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        mock_ydl.return_value.__enter__.return_value.extract_info.side_effect = extract_info
+        batch = await downloader.batch_download(urls)
+
+    assert max(peak) == 2
+    assert [r.title for r in batch.results] == [url for url in urls if not url.endswith('test3')]
+    assert list(batch.failures) == [urls[3]]
+    assert '404' in batch.failures[urls[3]]
+
+@pytest.mark.asyncio
+async def test_expand_channel_lists_entries_flat(downloader):
+    infos = {
+        'https://www.youtube.com/@artist': {
+            '_type': 'playlist',
+            'title': 'Artist',
+            'entries': [
+                {'_type': 'url', 'ie_key': 'YoutubeTab', 'url': 'https://www.youtube.com/@artist/videos'},
+                {'_type': 'url', 'ie_key': 'YoutubeTab', 'url': 'https://www.youtube.com/playlist?list=PL1'},
+            ]
+        },
+        'https://www.youtube.com/@artist/videos': {
+            '_type': 'playlist',
+            'title': 'Artist - Videos',
+            'entries': [
+                {'_type': 'url', 'ie_key': 'Youtube', 'url': 'https://www.youtube.com/watch?v=a', 'title': 'A'},
+                None,
+            ]
+        },
+        'https://www.youtube.com/playlist?list=PL1': {
+            '_type': 'playlist',
+            'title': 'Live',
+            'entries': [
+                {'_type': 'url', 'ie_key': 'Youtube', 'url': 'https://www.youtube.com/watch?v=b', 'title': 'B'},
+                {'_type': 'url', 'ie_key': 'Youtube', 'url': 'https://www.youtube.com/watch?v=c', 'title': 'C'},
+            ]
+        },
+    }
+
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        instance = mock_ydl.return_value.__enter__.return_value
+        instance.extract_info.side_effect = lambda url, download: infos[url]
+        entries = await downloader.expand('https://www.youtube.com/@artist')
+
+    assert all(call.args[0]['extract_flat'] == 'in_playlist' for call in mock_ydl.call_args_list)
+    assert all(not call.kwargs['download'] for call in instance.extract_info.call_args_list)
+    assert [(e.url[-1], e.title, e.playlist, e.index) for e in entries] == [
+        ('a', 'A', 'Artist - Videos', 1),
+        ('b', 'B', 'Live', 1),
+        ('c', 'C', 'Live', 2),
+    ]
+
+@pytest.mark.asyncio
+async def test_expand_single_track_skips_extraction(downloader):
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        entries = await downloader.expand('https://www.youtube.com/watch?v=test')
+
+    assert [e.url for e in entries] == ['https://www.youtube.com/watch?v=test']
+    mock_ydl.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_media_cache_skips_repeat_downloads(sample_config, temp_dir):
+    sample_config.cache.enabled = True
+    downloader = Downloader(sample_config)
+    sample_config.paths.download_dir.mkdir(parents=True, exist_ok=True)
+    info = {'id': 'abc', 'extractor_key': 'Youtube', 'title': 'Test Song', 'vcodec': 'none'}
+
+    def process_ie_result(info, download):
+        path = sample_config.paths.download_dir / 'Test Song.wav'
+        path.write_bytes(b'\0' * 100)
+        return {**info, 'requested_downloads': [{'filepath': str(path)}]}
+
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        instance = mock_ydl.return_value.__enter__.return_value
+        instance.extract_info.return_value = info
+        instance.process_ie_result.side_effect = process_ie_result
+        instance.prepare_filename.return_value = str(sample_config.paths.download_dir / 'Test Song.webm')
+
+        first = await downloader.download('https://youtube.com/watch?v=abc')
+        # The cached copy outlives the original
+        first.file_path.unlink()
+        second = await downloader.download('https://youtu.be/abc')
+
+    assert instance.process_ie_result.call_count == 1
+    assert second.file_path.read_bytes() == b'\0' * 100
+    stats = downloader.media_cache.stats
+    assert (stats['hits'], stats['misses'], stats['bytes_saved']) == (1, 1, 100)
+
+    # Another requested format is a separate entry
+    sample_config.download.format = 'worstaudio'
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        instance = mock_ydl.return_value.__enter__.return_value
+        instance.extract_info.return_value = info
+        instance.process_ie_result.side_effect = process_ie_result
+        await downloader.download('https://youtube.com/watch?v=abc')
+    assert instance.process_ie_result.call_count == 1
+
+def test_media_cache_is_off_without_keep_original(sample_config):
+    sample_config.cache.enabled = True
+    sample_config.download.keep_original = False
+    assert Downloader(sample_config).media_cache is None
+
+@pytest.mark.asyncio
+async def test_media_cache_link_name_is_sanitized(sample_config, temp_dir):
+    sample_config.cache.enabled = True
+    downloader = Downloader(sample_config)
+    download_dir = sample_config.paths.download_dir
+    download_dir.mkdir(parents=True, exist_ok=True)
+    info = {'id': 'abc', 'extractor_key': 'Youtube', 'title': '../../AC/DC', 'ext': 'webm'}
+    cached = temp_dir / 'cached.wav'
+    cached.write_bytes(b'\0' * 100)
+    downloader.media_cache.store_file(downloader._media_key(info), cached)
+    prepare_filename = yt_dlp.YoutubeDL(downloader.ydl_opts).prepare_filename
+
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        instance = mock_ydl.return_value.__enter__.return_value
+        instance.extract_info.return_value = info
+        instance.prepare_filename.side_effect = prepare_filename
+        result = await downloader.download('https://youtube.com/watch?v=abc')
+
+    instance.process_ie_result.assert_not_called()
+    assert result.file_path.parent == download_dir
+    assert result.file_path.suffix == '.wav'
+    assert result.file_path.read_bytes() == b'\0' * 100
+
+@pytest.mark.asyncio
+async def test_download_progress_is_rate_limited(downloader, temp_dir):
+    mock_info = {
+        'title': 'Test Song',
+        'requested_downloads': [{'filepath': str(temp_dir / 'test.wav')}],
+        'vcodec': 'none'
+    }
+    updates = []
+
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        def extract_info(url, download):
+            opts = mock_ydl.call_args.args[0]
+            for done in range(0, 1000, 10):
+                opts['progress_hooks'][0]({
+                    'status': 'downloading',
+                    'downloaded_bytes': done,
+                    'total_bytes': 1000,
+                    'speed': 2048.0,
+                    'eta': 3
+                })
+            opts['progress_hooks'][0]({'status': 'finished'})
+            opts['postprocessor_hooks'][0]({'status': 'started', 'postprocessor': 'ExtractAudio'})
+            return mock_info
+
+        mock_ydl.return_value.__enter__.return_value.extract_info.side_effect = extract_info
+        await downloader.download(
+            'https://youtube.com/watch?v=test',
+            progress=lambda fraction, **details: updates.append((fraction, details))
+        )
+        await asyncio.sleep(0)
+
+    # 100 hook calls within the interval collapse to the first and the final states
+    assert updates == [
+        (0.0, {'speed': 2048.0, 'eta': 3, 'details': 'Downloading'}),
+        (1.0, {'details': 'Downloaded'}),
+        (1.0, {'details': 'Post-processing (ExtractAudio)'}),
+    ]
@@ -0,0 +1,78 @@
+import pytest
+import wave
+import numpy as np
+from unittest.mock import patch, MagicMock
+from cloud_splitter.config import Config
+from cloud_splitter.encoder import StemEncoder
+from cloud_splitter.exceptions import ProcessingError
+from cloud_splitter.processor import ProcessingResult, SeparatorType
+
+def staged_result(config, name="song"):
+    """A separation result with WAV stems in the staging directory"""
+    output_dir = config.paths.cache_dir / "staging" / name
+    stems = {}
+    for stem in ("vocals", "drums"):
+        path = output_dir / "htdemucs" / f"{stem}.wav"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with wave.open(str(path), "wb") as wav_file:
+            wav_file.setnchannels(2)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(44100)
+            wav_file.writeframes((np.random.randn(44100 * 2) * 3000).astype("<i2").tobytes())
+        stems[stem] = path
+    return ProcessingResult(
+        input_file=config.paths.download_dir / f"{name}.wav",
+        output_dir=output_dir,
+        stems=stems,
+        separator_used=SeparatorType.DEMUCS
+    )
+
+@pytest.fixture
+def config(tmp_path):
+    config = Config()
+    config.paths.download_dir = tmp_path / "downloads"
+    config.paths.output_dir = tmp_path / "output"
+    config.paths.cache_dir = tmp_path / "cache"
+    return config
+
+@pytest.mark.asyncio
+async def test_encode_mp3_moves_stems_to_output_dir(config):
+    config.processing.output_format = "mp3"
+    staged = staged_result(config)
+    encoder = StemEncoder(config)
+
+    result = await encoder.encode(staged)
+    encoder.close()
+
+    assert result.output_dir == config.paths.output_dir / "song"
+    assert result.stems == {
+        stem: config.paths.output_dir / "song" / "htdemucs" / f"{stem}.mp3"
+        for stem in ("vocals", "drums")
+    }
+    for path in result.stems.values():
+        assert 0 < path.stat().st_size < 44100 * 2 * 2 * 2
+    assert not staged.output_dir.exists()
+
+@pytest.mark.asyncio
+async def test_wav_output_is_left_in_place(config):
+    staged = staged_result(config)
+    encoder = StemEncoder(config)
+
+    assert not encoder.enabled
+    assert await encoder.encode(staged) is staged
+
+@pytest.mark.asyncio
+async def test_ffmpeg_failure_keeps_staged_stems(config):
+    config.processing.output_format = "flac"
+    staged = staged_result(config)
+    encoder = StemEncoder(config)
+
+    failed = MagicMock(returncode=1, stderr=b"Unknown encoder 'flac'")
+    with patch('cloud_splitter.encoder.subprocess.run', return_value=failed) as mock_run:
+        with pytest.raises(ProcessingError, match="Unknown encoder"):
+            await encoder.encode(staged)
+    encoder.close()
+
+    assert all(call.args[0][-1].endswith(".partial.flac") for call in mock_run.call_args_list)
+    assert all(path.exists() for path in staged.stems.values())
+    assert not list(config.paths.output_dir.rglob("*.flac"))
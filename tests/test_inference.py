@@ -0,0 +1,85 @@
+import pytest
+import torch
+from unittest.mock import patch
+from cloud_splitter.inference import (
+    AutocastModel, CompiledModel, apply_precision, compile_model, signal_to_distortion
+)
+
+class ConvModel(torch.nn.Module):
+    """Small traceable separation model with real weights"""
+    sources = ["drums", "bass", "other", "vocals"]
+    samplerate = 8000
+    audio_channels = 2
+    segment = 1.0
+
+    def __init__(self):
+        super().__init__()
+        torch.manual_seed(0)
+        self.conv = torch.nn.Conv1d(2, 8, 5, padding=2)
+
+    def forward(self, x):
+        batch, channels, length = x.shape
+        return self.conv(x).view(batch, 4, channels, length)
+
+class LinearModel(ConvModel):
+    """Separation model with a Linear layer for dynamic quantization"""
+
+    def __init__(self):
+        super().__init__()
+        self.mix = torch.nn.Linear(8, 8)
+
+    def forward(self, x):
+        batch, channels, length = x.shape
+        out = self.mix(self.conv(x).transpose(1, 2)).transpose(1, 2)
+        return out.reshape(batch, 4, channels, length)
+
+def test_compile_model_traces_once_and_reuses_artifact(temp_dir):
+    model = ConvModel().eval()
+
+    compiled = compile_model(model, "torchscript", "conv", "cpu", 2, 4000, temp_dir)
+    assert isinstance(compiled, CompiledModel)
+    assert len(list(temp_dir.glob("conv-0-cpu-2x2x4000-*.pt"))) == 1
+
+    with patch('cloud_splitter.inference.torch.jit.trace', side_effect=AssertionError("traced again")):
+        reloaded = compile_model(model, "torchscript", "conv", "cpu", 2, 4000, temp_dir)
+
+    # Shorter segments and partial batches are padded to the traced shape
+    x = torch.randn(1, 2, 3000)
+    with torch.no_grad():
+        assert torch.allclose(reloaded(x), model(x), atol=1e-5)
+
+def test_compile_model_falls_back_to_eager_on_mismatch(temp_dir):
+    model = ConvModel().eval()
+
+    with patch('cloud_splitter.inference.max_abs_difference', return_value=1.0):
+        compiled = compile_model(model, "torchscript", "conv", "cpu", 2, 4000, temp_dir)
+
+    assert compiled is model
+    assert compile_model(model, "eager", "conv", "cpu", 2, 4000, temp_dir) is model
+    with pytest.raises(ValueError, match="Unsupported inference backend"):
+        compile_model(model, "onnx", "conv", "cpu", 2, 4000, temp_dir)
+
+def test_int8_precision_quantizes_linear_layers():
+    model = LinearModel().eval()
+    quantized = apply_precision(model, "int8", "cpu")
+
+    assert type(model.mix) is torch.nn.Linear
+    assert "quantized" in type(quantized.mix).__module__
+    x = torch.randn(1, 2, 4000)
+    with torch.no_grad():
+        assert signal_to_distortion(model(x), quantized(x)) > 20
+
+def test_bf16_precision_returns_float32():
+    model = LinearModel().eval()
+    reduced = apply_precision(model, "bf16", "cpu")
+
+    assert isinstance(reduced, AutocastModel)
+    assert reduced.sources == model.sources
+    x = torch.randn(1, 2, 4000)
+    with torch.no_grad():
+        out = reduced(x)
+        assert out.dtype == torch.float32
+        assert signal_to_distortion(model(x), out) > 20
+    assert apply_precision(model, "fp32", "cpu") is model
+    with pytest.raises(ValueError, match="Unsupported precision"):
+        apply_precision(model, "fp8", "cpu")
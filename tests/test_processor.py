@@ -1,66 +1,536 @@
 import pytest
 from pathlib import Path
-from cloud_splitter.processor import Processor, ProcessingResult, SeparatorType
+import wave
+import queue
+import threading
+import time
+import asyncio
+import numpy as np
+import torch
+from demucs.apply import apply_model
+from concurrent.futures import ThreadPoolExecutor
+from cloud_splitter.processor import Processor, PooledProcessor, ProcessingResult, SeparatorType, ModelRegistry
+from cloud_splitter.core.processor_factory import ProcessorFactory
+from cloud_splitter.inference import CompiledModel
+from tests.test_inference import ConvModel, LinearModel
 from unittest.mock import patch, MagicMock
 
+class FakeModel(torch.nn.Module):
+    """Tiny stand-in for a demucs model: every source is a quarter of the mix"""
+    sources = ["drums", "bass", "other", "vocals"]
+    samplerate = 8000
+    audio_channels = 2
+    segment = 1.0
+
+    def forward(self, x):
+        return torch.stack([x * 0.25] * len(self.sources), dim=1)
+
+def read_stem(path):
+    """Decode a 16-bit stereo WAV stem written by the processor"""
+    with wave.open(str(path), "rb") as stem:
+        frames = np.frombuffer(stem.readframes(stem.getnframes()), dtype="<i2")
+    return torch.from_numpy(frames.reshape(-1, 2).T / (2**15 - 1)).float()
+
 @pytest.fixture
 def sample_config(temp_dir):
     class Config:
         class Processing:
             separator = "demucs"
             stems = ["vocals", "drums", "bass", "other"]
-        
+            progress_interval = 0.0
+            preview = False
+            preview_duration = 0.5
+            output_format = "wav"
+            encode_workers = 2
+            mp3_bitrate = 320
+            opus_bitrate = 160
+
         class Demucs:
             model = "htdemucs"
             cpu_only = True
             shifts = 2
-        
+            max_loaded_models = 1
+            batch_size = 4
+            overlap = 0.25
+            streaming = False
+            stream_threshold = 900.0
+            stream_window = 1.0
+            stream_overlap = 0.25
+            workers = 0
+            threads_per_worker = 0
+            backend = "eager"
+            precision = "fp32"
+            skip_silence = False
+            silence_threshold = -60.0
+            warmup = False
+
         class Paths:
             output_dir = temp_dir / "output"
-        
+            cache_dir = temp_dir / "cache"
+
+        class Cache:
+            enabled = False
+            separation_max_size = 1024**3
+            checkpoint_max_age = 3600
+            decoded_audio = True
+            decoded_max_size = 1024**3
+
         processing = Processing()
         demucs = Demucs()
         paths = Paths()
-    
+        cache = Cache()
+
     return Config()
 
 @pytest.fixture
 def processor(sample_config):
-    return Processor(sample_config)
+    return Processor(sample_config, registry=ModelRegistry())
+
+@pytest.fixture
+def fake_model():
+    with patch('cloud_splitter.processor.get_model', side_effect=lambda name: FakeModel()) as mock_get:
+        yield mock_get
 
 def test_processor_initialization(processor):
     assert processor.config is not None
     assert processor.device == "cpu"  # Since cpu_only is True in sample_config
 
 @pytest.mark.asyncio
-async def test_process_file_demucs(processor, temp_dir):
+async def test_process_file_demucs(processor, temp_dir, fake_model):
     input_file = temp_dir / "test.wav"
     input_file.touch()
-    
-    with patch('demucs.separate.main') as mock_demucs:
-        # Create expected output structure
-        output_dir = processor.config.paths.output_dir / input_file.stem
-        output_dir.mkdir(parents=True)
-        model_dir = output_dir / processor.config.demucs.model
-        model_dir.mkdir()
-        
-        # Create mock stem directories and files
-        for stem in processor.config.processing.stems:
-            stem_dir = model_dir / stem
-            stem_dir.mkdir()
-            (stem_dir / input_file.stem).touch()
-        
+
+    with patch.object(Processor, '_load_audio', return_value=torch.rand(2, 8000) - 0.5):
+        result = await processor.process_file(input_file)
+
+    assert isinstance(result, ProcessingResult)
+    assert result.separator_used == SeparatorType.DEMUCS
+    assert len(result.stems) == len(processor.config.processing.stems)
+    assert all(stem in result.stems for stem in processor.config.processing.stems)
+    assert all(path.exists() for path in result.stems.values())
+
+@pytest.mark.asyncio
+async def test_compressed_output_stages_wav_stems(processor, temp_dir, fake_model):
+    processor.config.processing.output_format = "flac"
+
+    with patch.object(Processor, '_load_audio', return_value=torch.rand(2, 8000) - 0.5):
+        result = await processor.process_file(temp_dir / "test.wav")
+
+    assert result.output_dir == processor.config.paths.cache_dir / "staging" / "test"
+    assert not processor.config.paths.output_dir.exists()
+
+@pytest.mark.asyncio
+async def test_model_stays_resident_across_files(processor, temp_dir, fake_model):
+    with patch.object(Processor, '_load_audio', return_value=torch.rand(2, 8000) - 0.5):
+        for name in ("one.wav", "two.wav"):
+            await processor.process_file(temp_dir / name)
+
+    assert fake_model.call_count == 1
+    assert ("htdemucs", "cpu") in processor.registry
+
+@pytest.mark.asyncio
+async def test_process_batch_shares_forward_passes(processor, temp_dir, fake_model):
+    input_files = [temp_dir / "one.wav", temp_dir / "two.wav", temp_dir / "three.wav"]
+    wav = torch.rand(2, 20000) - 0.5
+
+    with patch.object(Processor, '_load_audio', return_value=wav), \
+            patch('cloud_splitter.processor.apply_model', wraps=apply_model) as mock_apply:
+        results = await processor.process_batch(input_files)
+
+    # shifts leave room for a half second offset, so 3 tracks x 7 segments
+    # of 4000 samples each, packed 4 segments per forward pass
+    assert mock_apply.call_count == 6
+    assert [result.input_file for result in results] == input_files
+    assert all(len(result.stems) == 4 for result in results)
+
+def test_separate_tracks_overlap_add_is_seamless(processor, fake_model):
+    model = FakeModel()
+    wavs = [torch.rand(2, 20000), torch.rand(2, 5000)]
+    wavs = [wav - wav.mean() for wav in wavs]
+
+    separated = processor._separate_tracks(model, wavs)
+
+    for wav, sources in zip(wavs, separated):
+        assert set(sources) == set(model.sources)
+        assert torch.allclose(sources["vocals"], wav * 0.25, atol=1e-5)
+
+@pytest.mark.asyncio
+async def test_silent_segments_skip_inference(processor, temp_dir, fake_model):
+    processor.config.demucs.skip_silence = True
+    wav = torch.rand(2, 32000) - 0.5
+    wav = wav - wav.mean()
+    wav[..., 8000:28000] = 0
+
+    with patch('cloud_splitter.processor.apply_model', wraps=apply_model) as mock_apply:
+        skipped = []
+        separated = processor._separate_tracks(FakeModel(), [wav], skipped=skipped)[0]
+
+    # 11 segments of 4000 samples, 6 of them entirely inside the silence
+    assert mock_apply.call_count == 2
+    assert skipped[0].sum().item() == 17000
+    assert torch.allclose(separated["vocals"], wav * 0.25, atol=1e-3)
+
+    with patch.object(Processor, '_load_audio', return_value=wav):
+        result = await processor.process_file(temp_dir / "live-set.wav")
+    assert result.skipped_seconds == 17000 / 8000
+
+    # Off by default: every segment goes through the model
+    processor.config.demucs.skip_silence = False
+    skipped = []
+    processor._separate_tracks(FakeModel(), [wav], skipped=skipped)
+    assert skipped[0].sum().item() == 0
+
+@pytest.mark.asyncio
+async def test_long_input_is_streamed_in_windows(processor, temp_dir, fake_model):
+    processor.config.demucs.streaming = True
+    processor.config.demucs.stream_threshold = 2.0
+    wav = torch.rand(2, 8000 * 5) - 0.5
+    wav = wav - wav.mean()
+    input_file = temp_dir / "long.wav"
+    input_file.write_bytes(b"long recording")
+    reads = []
+
+    def read_window(self, input_file, model, offset, length, audio=None):
+        reads.append(length)
+        return wav[..., offset:offset + length]
+
+    with patch.object(Processor, '_audio_duration', return_value=5.0), \
+            patch.object(Processor, '_read_window', read_window), \
+            patch.object(Processor, '_load_audio', side_effect=AssertionError("decoded whole file")):
         result = await processor.process_file(input_file)
-        
-        assert isinstance(result, ProcessingResult)
-        assert result.separator_used == SeparatorType.DEMUCS
-        assert len(result.stems) == len(processor.config.processing.stems)
-        assert all(stem in result.stems for stem in processor.config.processing.stems)
+
+    assert len(reads) == 5
+    assert all(length <= 8000 + 2000 for length in reads)
+    assert torch.allclose(read_stem(result.stems["vocals"]), wav * 0.25, atol=1e-2)
+    assert not list((processor.config.paths.cache_dir / "checkpoints").iterdir())
+
+def test_streaming_can_be_switched_off(processor):
+    processor.config.demucs.stream_threshold = 2.0
+    model = FakeModel()
+
+    with patch.object(Processor, '_audio_duration', return_value=5.0):
+        assert not processor._should_stream(Path("long.wav"), model)
+        processor.config.demucs.streaming = True
+        assert processor._should_stream(Path("long.wav"), model)
+
+@pytest.mark.asyncio
+async def test_interrupted_stream_resumes_from_checkpoint(processor, temp_dir, fake_model):
+    processor.config.demucs.streaming = True
+    processor.config.demucs.stream_threshold = 2.0
+    wav = torch.rand(2, 8000 * 5) - 0.5
+    wav = wav - wav.mean()
+    input_file = temp_dir / "long.wav"
+    input_file.write_bytes(b"long recording")
+    offsets = []
+
+    def crashing_read(self, input_file, model, offset, length, audio=None):
+        if offset >= 16000:
+            raise RuntimeError("worker died")
+        return wav[..., offset:offset + length]
+
+    def read_window(self, input_file, model, offset, length, audio=None):
+        offsets.append(offset)
+        return wav[..., offset:offset + length]
+
+    with patch.object(Processor, '_audio_duration', return_value=5.0):
+        with patch.object(Processor, '_read_window', crashing_read):
+            with pytest.raises(RuntimeError, match="worker died"):
+                await processor.process_file(input_file)
+        with patch.object(Processor, '_read_window', read_window):
+            result = await processor.process_file(input_file)
+
+    assert offsets == [16000, 24000, 32000]
+    assert torch.allclose(read_stem(result.stems["vocals"]), wav * 0.25, atol=1e-2)
+    assert not list((processor.config.paths.cache_dir / "checkpoints").iterdir())
+
+@pytest.mark.asyncio
+async def test_separation_runs_off_event_loop_with_progress(processor, temp_dir, fake_model):
+    reported = []
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0)
+
+    with patch.object(Processor, '_load_audio', return_value=torch.rand(2, 40000) - 0.5):
+        ticking = asyncio.create_task(ticker())
+        await processor.process_file(temp_dir / "test.wav", progress=reported.append)
+        ticking.cancel()
+
+    assert ticks > 1
+    assert reported == sorted(reported)
+    assert reported[-1] == 1.0
+    assert len(reported) > 2
+
+@pytest.mark.asyncio
+async def test_separation_cache_skips_model_on_repeat(sample_config, temp_dir, fake_model):
+    sample_config.cache.enabled = True
+    processor = Processor(sample_config, registry=ModelRegistry())
+    wav = torch.rand(2, 8000) - 0.5
+
+    with patch.object(Processor, '_decoded_audio', return_value=wav), \
+            patch('cloud_splitter.processor.apply_model', wraps=apply_model) as mock_apply:
+        first = await processor.process_file(temp_dir / "upload.wav")
+        calls = mock_apply.call_count
+        second = await processor.process_file(temp_dir / "same-song-other-url.wav")
+
+    assert mock_apply.call_count == calls
+    assert (processor.cache.hits, processor.cache.misses) == (1, 1)
+    assert set(second.stems) == set(first.stems)
+    assert all(path.exists() for path in second.stems.values())
+    assert second.output_dir != first.output_dir
+
+    # Changing a separation setting must not reuse the cached stems
+    sample_config.demucs.shifts = 0
+    with patch.object(Processor, '_decoded_audio', return_value=wav):
+        await processor.process_file(temp_dir / "upload.wav")
+    assert processor.cache.misses == 2
+    sample_config.demucs.overlap = 0.5
+    with patch.object(Processor, '_decoded_audio', return_value=wav):
+        await processor.process_file(temp_dir / "upload.wav")
+    assert processor.cache.misses == 3
+
+@pytest.mark.asyncio
+async def test_separation_cache_hit_reports_skipped_silence(sample_config, temp_dir, fake_model):
+    sample_config.cache.enabled = True
+    sample_config.demucs.skip_silence = True
+    processor = Processor(sample_config, registry=ModelRegistry())
+    wav = torch.rand(2, 32000) - 0.5
+    wav = wav - wav.mean()
+    wav[..., 8000:28000] = 0
+
+    with patch.object(Processor, '_decoded_audio', return_value=wav):
+        first = await processor.process_file(temp_dir / "live-set.wav")
+        second = await processor.process_file(temp_dir / "live-set-again.wav")
+
+    assert processor.cache.hits == 1
+    assert set(second.stems) == set(first.stems)
+    assert second.skipped_seconds == first.skipped_seconds == 17000 / 8000
+
+def test_stream_settings_are_part_of_streamed_cache_keys(sample_config):
+    sample_config.cache.enabled = True
+    processor = Processor(sample_config, registry=ModelRegistry())
+    key = processor._cache_key([b"pcm"], streamed=True)
+    whole = processor._cache_key([b"pcm"])
+
+    sample_config.demucs.stream_window = 2.0
+    assert processor._cache_key([b"pcm"], streamed=True) != key
+    assert processor._cache_key([b"pcm"]) == whole
+
+@pytest.mark.asyncio
+async def test_two_stem_mode_writes_only_requested_stems(processor, temp_dir, fake_model):
+    processor.config.processing.stems = ["vocals", "no_vocals"]
+    wav = torch.rand(2, 8000)
+    wav = wav - wav.mean()
+
+    with patch.object(Processor, '_load_audio', return_value=wav):
+        result = await processor.process_file(temp_dir / "karaoke.wav")
+
+    written = sorted(path.name for path in (result.output_dir / "htdemucs").iterdir())
+    assert written == ["no_vocals.wav", "vocals.wav"]
+    assert set(result.stems) == {"vocals", "no_vocals"}
+
+    separated = processor._separate_tracks(FakeModel(), [wav])[0]
+    assert torch.allclose(separated["no_vocals"], wav * 0.75, atol=1e-5)
+
+def test_unknown_stems_are_rejected(processor):
+    processor.config.processing.stems = ["kazoo"]
+    with pytest.raises(ValueError, match="None of the requested stems"):
+        processor._stem_selection(FakeModel())
+
+@pytest.mark.asyncio
+async def test_preview_is_published_then_replaced(processor, temp_dir, fake_model):
+    wav = torch.rand(2, 16000) - 0.5
+    lengths = []
+
+    def frames(path):
+        with wave.open(str(path), "rb") as stem:
+            return stem.getnframes()
+
+    def on_preview(preview):
+        lengths.append(frames(preview.stems["vocals"]))
+
+    def read_window(self, input_file, model, offset, length, audio=None):
+        return wav[..., offset:offset + length]
+
+    with patch.object(Processor, '_read_window', read_window), \
+            patch.object(Processor, '_load_audio', return_value=wav):
+        result = await processor.process_progressive(temp_dir / "song.wav", on_preview)
+
+    assert lengths == [4000]
+    assert frames(result.stems["vocals"]) == 16000
+    assert not list(result.output_dir.rglob(".*partial*"))
+
+def test_factory_selects_pooled_processor(sample_config):
+    assert type(ProcessorFactory.create_processor(sample_config)) is Processor
+
+    sample_config.demucs.workers = 4
+    with patch('cloud_splitter.processor.ProcessPoolExecutor') as mock_pool, \
+            patch('cloud_splitter.processor.os.cpu_count', return_value=32):
+        processor = ProcessorFactory.create_processor(sample_config)
+
+    assert isinstance(processor, PooledProcessor)
+    assert processor.concurrency == 4
+    assert processor.threads_per_worker == 8
+    assert mock_pool.call_args.kwargs["max_workers"] == 4
+    assert mock_pool.call_args.kwargs["initargs"] == (sample_config, 8)
+
+@pytest.mark.asyncio
+async def test_pooled_processor_spreads_batch_over_workers(sample_config, temp_dir):
+    sample_config.demucs.workers = 2
+    input_files = [temp_dir / f"{index}.wav" for index in range(5)]
+    shares = []
+
+    def run_in_worker(files, progress_queue=None):
+        shares.append(files)
+        return [
+            ProcessingResult(input_file=f, output_dir=temp_dir, stems={}, separator_used=SeparatorType.DEMUCS)
+            for f in files
+        ]
+
+    with ThreadPoolExecutor(max_workers=2) as executor, \
+            patch('cloud_splitter.processor._run_in_worker', run_in_worker):
+        processor = PooledProcessor(sample_config, executor=executor)
+        results = await processor.process_batch(input_files)
+
+    assert sorted(len(share) for share in shares) == [2, 3]
+    assert [result.input_file for result in results] == input_files
+
+def test_pooled_warm_up_waits_for_every_worker(sample_config):
+    sample_config.demucs.workers = 2
+    threads = set()
+
+    def wait_for_workers(barrier):
+        barrier.wait()
+        threads.add(threading.get_ident())
+
+    # More threads than workers: one fast thread must not take every task
+    with ThreadPoolExecutor(max_workers=4) as executor, \
+            patch('cloud_splitter.processor._wait_for_workers', wait_for_workers):
+        processor = PooledProcessor(sample_config, executor=executor)
+        processor._barrier = threading.Barrier
+        processor.warm_up()
+
+    assert len(threads) == 2
+
+@pytest.mark.asyncio
+async def test_pooled_processor_forwards_worker_progress(sample_config, temp_dir):
+    sample_config.demucs.workers = 1
+    reported = []
+    polls = 0
+
+    class CountingQueue(queue.Queue):
+        def empty(self):
+            nonlocal polls
+            polls += 1
+            return super().empty()
+
+    def run_in_worker(files, progress_queue=None):
+        for fraction in (0.5, 1.0):
+            progress_queue.put(fraction)
+            time.sleep(0.1)
+        return [
+            ProcessingResult(input_file=f, output_dir=temp_dir, stems={}, separator_used=SeparatorType.DEMUCS)
+            for f in files
+        ]
+
+    with ThreadPoolExecutor(max_workers=1) as executor, \
+            patch('cloud_splitter.processor._run_in_worker', run_in_worker):
+        processor = PooledProcessor(sample_config, executor=executor)
+        processor._progress_queue = CountingQueue
+        await processor.process_file(temp_dir / "test.wav", progress=reported.append)
+        processor.close()
+
+    assert reported == [0.5, 1.0]
+    # progress_interval is 0 in this config; polling is still rate limited
+    assert polls < 20
+
+def test_registry_evicts_previous_model_on_change(fake_model):
+    registry = ModelRegistry(max_models=1)
+    registry.get("htdemucs", "cpu")
+    registry.get("mdx_extra", "cpu")
+
+    assert len(registry) == 1
+    assert ("mdx_extra", "cpu") in registry
+    assert ("htdemucs", "cpu") not in registry
+
+    registry.max_models = 2
+    registry.get("htdemucs", "cpu")
+    assert len(registry) == 2
+    assert registry.evict(name="htdemucs") == 1
+
+def test_torchscript_backend_matches_eager(sample_config):
+    wav = torch.randn(2, 12000)
+    outputs = {}
+
+    with patch('cloud_splitter.processor.get_model', side_effect=lambda name: ConvModel()):
+        for backend in ("eager", "torchscript"):
+            sample_config.demucs.backend = backend
+            processor = Processor(sample_config, registry=ModelRegistry())
+            model = processor._load_model()
+            outputs[backend] = processor._separate_tracks(model, [wav])[0]
+
+    assert isinstance(model, CompiledModel)
+    assert list((sample_config.paths.cache_dir / "compiled").glob("htdemucs-0-cpu-4x2x8000-*.pt"))
+    for stem, eager in outputs["eager"].items():
+        assert torch.allclose(outputs["torchscript"][stem], eager, atol=1e-4)
+
+def test_precision_is_part_of_registry_and_cache_keys(sample_config):
+    sample_config.cache.enabled = True
+    sample_config.demucs.max_loaded_models = 2
+    processor = Processor(sample_config, registry=ModelRegistry())
+
+    with patch('cloud_splitter.processor.get_model', side_effect=lambda name: LinearModel()):
+        full = processor._load_model()
+        key = processor._cache_key([b"pcm"])
+        sample_config.demucs.precision = "int8"
+        quantized = processor._load_model()
+
+    assert ("htdemucs", "cpu", "eager") in processor.registry
+    assert ("htdemucs", "cpu", "eager/int8") in processor.registry
+    assert type(full.mix) is torch.nn.Linear
+    assert "quantized" in type(quantized.mix).__module__
+    assert processor._cache_key([b"pcm"]) != key
+
+def test_warm_up_loads_model_and_runs_inference(processor, fake_model):
+    processor.config.demucs.skip_silence = True
+
+    with patch('cloud_splitter.processor.apply_model', wraps=apply_model) as mock_apply:
+        processor.warm_up()
+
+    assert fake_model.call_count == 1
+    assert mock_apply.call_count == 1
+    assert ("htdemucs", "cpu") in processor.registry
 
 @pytest.mark.asyncio
 async def test_process_file_invalid_separator(processor):
     processor.config.processing.separator = "invalid"
     input_file = Path("test.wav")
-    
+
     with pytest.raises(ValueError, match="Unsupported separator"):
         await processor.process_file(input_file)
+
+@pytest.mark.asyncio
+async def test_streamed_job_decodes_once_past_the_cache_limit(sample_config, temp_dir, fake_model):
+    sample_config.cache.enabled = True
+    sample_config.cache.decoded_max_size = 1024
+    sample_config.demucs.streaming = True
+    sample_config.demucs.stream_threshold = 2.0
+    processor = Processor(sample_config, registry=ModelRegistry())
+    input_file = temp_dir / "song.wav"
+    input_file.write_bytes(b"encoded audio")
+    audio = (np.random.rand(8000 * 3, 2) - 0.5).astype(np.float32)
+    decodes = []
+
+    def decode_chunks(path, samplerate, channels):
+        decodes.append((path, samplerate, channels))
+        yield audio
+
+    with patch('cloud_splitter.utils.audio.decode_chunks', decode_chunks):
+        result = await processor.process_file(input_file)
+
+    assert decodes == [(input_file, 8000, 2)]
+    assert processor.decoded.store.stats["entries"] == 0
+    assert read_stem(result.stems["vocals"]).shape == (2, 8000 * 3)
@@ -0,0 +1,76 @@
+import os
+import pytest
+import numpy as np
+from unittest.mock import patch
+from cloud_splitter.utils.cache import DecodedAudioCache, DiskLRUCache, SeparationCache
+
+def _write(path, size):
+    path.write_bytes(b"\0" * size)
+    return path
+
+def test_disk_lru_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskLRUCache(tmp_path / "cache", max_bytes=250)
+    for index, key in enumerate(["a", "b"]):
+        cache.put(key, {"vocals": _write(tmp_path / f"{key}.wav", 100)})
+        os.utime(cache.entry_path(key), (index, index))
+
+    # "a" is the oldest entry, but using it makes "b" the next to go
+    assert cache.get("a") is not None
+    cache.put("c", {"vocals": _write(tmp_path / "c.wav", 100)})
+
+    assert sorted(path.name for path in cache.root.iterdir()) == ["a", "c"]
+
+def test_disk_lru_cache_only_rescans_when_over_budget(tmp_path):
+    cache = DiskLRUCache(tmp_path / "cache", max_bytes=250)
+    with patch.object(DiskLRUCache, "_entries", wraps=cache._entries) as scans:
+        cache.put("a", {"vocals": _write(tmp_path / "a.wav", 100)})
+        cache.put("a", {"vocals": _write(tmp_path / "a.wav", 120)})
+        cache.put("b", {"vocals": _write(tmp_path / "b.wav", 100)})
+        assert scans.call_count == 0
+        cache.put("c", {"vocals": _write(tmp_path / "c.wav", 100)})
+        assert scans.call_count == 1
+    assert cache._total == cache.stats["bytes"] == 200
+
+    # A new instance picks up what is already on disk
+    assert DiskLRUCache(tmp_path / "cache", max_bytes=250)._total == 200
+
+def test_disk_lru_cache_counts_hits_and_misses(tmp_path):
+    cache = DiskLRUCache(tmp_path / "cache", max_bytes=1024)
+    assert cache.get("missing") is None
+    cache.put("key", {"drums": _write(tmp_path / "drums.wav", 10)})
+    assert (cache.get("key") / "drums.wav").exists()
+
+    stats = cache.stats
+    assert (stats["hits"], stats["misses"], stats["entries"], stats["bytes"]) == (1, 1, 1, 10)
+
+def test_separation_cache_key_depends_on_audio_and_settings():
+    key = SeparationCache.key([b"pcm"], "htdemucs", 2, ["vocals", "drums"])
+
+    assert key == SeparationCache.key([b"p", b"cm"], "htdemucs", 2, ["drums", "vocals"])
+    assert key != SeparationCache.key([b"pcm!"], "htdemucs", 2, ["vocals", "drums"])
+    assert key != SeparationCache.key([b"pcm"], "htdemucs", 1, ["vocals", "drums"])
+    assert key != SeparationCache.key([b"pcm"], "htdemucs", 2, ["vocals"])
+
+def test_decoded_audio_cache_decodes_once_and_memory_maps(tmp_path):
+    source = _write(tmp_path / "song.wav", 10)
+    audio = np.random.randn(1000, 2).astype(np.float32)
+    decodes = []
+
+    def decode():
+        decodes.append(source)
+        return (audio[start:start + 300] for start in range(0, len(audio), 300))
+
+    cache = DecodedAudioCache(tmp_path / "decoded", max_bytes=1 << 20)
+    first = cache.load(source, 44100, 2, decode)
+    second = cache.load(source, 44100, 2, decode)
+
+    assert len(decodes) == 1
+    assert isinstance(second, np.memmap)
+    assert np.array_equal(first, audio) and np.array_equal(second, audio)
+    assert cache.stats["entries"] == 1
+
+    # A rewritten source and another sample rate are separate entries
+    os.utime(source, ns=(0, 0))
+    cache.load(source, 44100, 2, decode)
+    cache.load(source, 22050, 2, decode)
+    assert len(decodes) == 3
@@ -0,0 +1,38 @@
+import os
+import time
+import torch
+from cloud_splitter.utils.checkpoint import SeparationCheckpoint, ResumeIndex, prune_checkpoints
+
+def test_checkpoint_round_trip(tmp_path):
+    checkpoint = SeparationCheckpoint(tmp_path / "abc")
+    assert checkpoint.load() is None
+
+    tail = {"vocals": torch.ones(2, 10)}
+    checkpoint.save({"offset": 8000, "tail_length": 10, "skipped_samples": 0}, tail)
+
+    assert checkpoint.load()["offset"] == 8000
+    assert torch.equal(checkpoint.load_tail()["vocals"], tail["vocals"])
+    assert not list(checkpoint.directory.glob(".*"))
+
+    checkpoint.clear()
+    assert not checkpoint.directory.exists()
+
+def test_prune_removes_only_stale_checkpoints(tmp_path):
+    stale = SeparationCheckpoint(tmp_path / "stale")
+    fresh = SeparationCheckpoint(tmp_path / "fresh")
+    for checkpoint in (stale, fresh):
+        checkpoint.save({"offset": 0}, None)
+    old = time.time() - 7200
+    os.utime(stale.directory, (old, old))
+
+    assert prune_checkpoints(tmp_path, max_age=3600) == 1
+    assert not stale.directory.exists()
+    assert fresh.directory.exists()
+
+def test_resume_index(tmp_path):
+    index = ResumeIndex(tmp_path / "resume.json")
+    index.put("https://example.com/a", {"file_path": "a.wav"})
+
+    assert ResumeIndex(tmp_path / "resume.json").get("https://example.com/a") == {"file_path": "a.wav"}
+    index.discard("https://example.com/a")
+    assert index.get("https://example.com/a") is None
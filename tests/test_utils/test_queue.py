@@ -0,0 +1,117 @@
+import pytest
+import sqlite3
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from cloud_splitter.utils.queue import ProcessingQueue, QueueStore, SchedulingPolicy
+
+async def drain(queue):
+    order = []
+    while (item := await queue.get_next_item()) is not None:
+        order.append(item.url)
+    return order
+
+@pytest.mark.asyncio
+async def test_fifo_takes_items_in_queue_order():
+    queue = ProcessingQueue()
+    await queue.add_items(["a", "b", "c"])
+    assert await drain(queue) == ["a", "b", "c"]
+
+@pytest.mark.asyncio
+async def test_shortest_job_first_uses_prefetched_duration():
+    queue = ProcessingQueue(SchedulingPolicy.SJF)
+    await queue.add_item("set", {"duration": 3 * 3600})
+    await queue.add_item("unknown")
+    await queue.add_item("song", {"duration": 180})
+    await queue.add_item("other")
+    await queue.update_metadata("other", {"duration": 240, "filesize": 4_000_000})
+
+    assert await drain(queue) == ["song", "other", "set", "unknown"]
+
+@pytest.mark.asyncio
+async def test_priority_ages_waiting_items():
+    queue = ProcessingQueue("priority", aging=1.0)
+    start = datetime(2024, 1, 1, 12, 0)
+    with patch('cloud_splitter.utils.queue.datetime') as clock:
+        clock.now.return_value = start
+        await queue.add_item("old", priority=0)
+        # Ten minutes later the old item has gained ten points of priority
+        clock.now.return_value = start + timedelta(minutes=10)
+        await queue.add_item("urgent", priority=15)
+        await queue.add_item("normal", priority=5)
+        order = await drain(queue)
+
+    assert order == ["urgent", "old", "normal"]
+
+@pytest.mark.asyncio
+async def test_status_counters_and_index_follow_transitions():
+    queue = ProcessingQueue()
+    await queue.add_items([f"url{i}" for i in range(5)])
+
+    first = await queue.get_next_item()
+    await queue.mark_complete(first.url)
+    await queue.mark_failed("url3", "removed")
+    # A pending item picked up out of order is not handed out again
+    await queue.update_progress("url1", 10.0)
+
+    assert queue.queue_status == {"pending": 2, "processing": 1, "complete": 1, "failed": 1}
+    assert [item.url for item in [await queue.get_next_item(), await queue.get_next_item()]] == ["url2", "url4"]
+    assert await queue.get_next_item() is None
+    assert not queue.has_pending
+
+    # Returning an item to pending queues it again
+    await queue.update_progress("url3", 0.0, status="pending")
+    assert queue.has_pending
+    assert (await queue.get_next_item()).url == "url3"
+
+@pytest.mark.asyncio
+async def test_persistent_queue_recovers_unfinished_items(tmp_path):
+    path = tmp_path / "queue.sqlite3"
+    queue = ProcessingQueue(store=QueueStore(path), flush_interval=3600)
+    await queue.add_items(["done", "crashed", "waiting"])
+    await queue.add_item("later", {"duration": 180}, priority=2)
+    await queue.mark_complete((await queue.get_next_item()).url, {"stems": {"vocals": tmp_path / "vocals.wav"}})
+    await queue.get_next_item()
+
+    # Transitions are batched until the interval passes or a flush
+    assert sqlite3.connect(path).execute("SELECT COUNT(*) FROM queue_items").fetchone() == (0,)
+    await queue.flush()
+    # The process dies here without closing the queue
+
+    recovered = ProcessingQueue(store=QueueStore(path))
+    assert [(item.url, item.status) for item in recovered.items] == [
+        ("crashed", "pending"), ("waiting", "pending"), ("later", "pending")
+    ]
+    assert recovered.items[-1].metadata == {"duration": 180}
+    assert recovered.items[-1].priority == 2
+    assert recovered.queue_status["pending"] == 3
+
+    await recovered.add_item("new")
+    order = await drain(recovered)
+    assert order == ["crashed", "waiting", "later", "new"]
+    for url in order:
+        await recovered.mark_complete(url)
+    recovered.close()
+    assert [item.url for item in ProcessingQueue(store=QueueStore(path)).items] == []
+
+@pytest.mark.asyncio
+async def test_readding_queued_urls_after_recovery_does_not_duplicate(tmp_path):
+    path = tmp_path / "queue.sqlite3"
+    queue = ProcessingQueue(store=QueueStore(path))
+    await queue.add_items(["a", "b"])
+    queue.close()
+
+    recovered = ProcessingQueue(store=QueueStore(path))
+    readded = await recovered.add_items(["a", "b"])
+    assert readded == recovered.items
+
+    order = await drain(recovered)
+    assert order == ["a", "b"]
+    for url in order:
+        await recovered.mark_complete(url)
+    assert recovered.queue_status == {"pending": 0, "processing": 0, "complete": 2, "failed": 0}
+
+    # A finished URL can be queued again
+    again = await recovered.add_item("a")
+    assert again.status == "pending" and len(recovered.items) == 3
+    recovered.close()
+    assert [item.url for item in ProcessingQueue(store=QueueStore(path)).items] == ["a"]
@@ -0,0 +1,48 @@
+import pytest
+from unittest.mock import patch
+from cloud_splitter.utils.status import ProgressThrottle, SlotPool, StatusManager
+
+def test_progress_throttle_drops_intermediate_updates():
+    reported = []
+    throttle = ProgressThrottle(reported.append, interval=1.0)
+
+    with patch('cloud_splitter.utils.status.time.monotonic', side_effect=[0.0, 0.2, 0.5, 1.5, 1.6]):
+        for fraction in (0.1, 0.2, 0.3, 0.4, 1.0):
+            throttle(fraction)
+
+    assert reported == [0.1, 0.4, 1.0]
+
+def test_status_manager_tracks_stages():
+    status = StatusManager()
+    status.update_status("processing", "running", 50.0, "Separating stems")
+    status.mark_complete("processing")
+
+    summary = status.status_summary
+    assert summary["stage"] == "processing"
+    assert summary["status"] == "complete"
+    assert summary["progress"] == 100.0
+
+def test_status_manager_progress_updates_in_place():
+    status = StatusManager()
+    status.update_status("processing", "starting", 0, "Separating stems")
+    started = status.current_status.start_time
+    for progress in (10.0, 50.0, 90.0):
+        status.update_progress("processing", progress)
+
+    assert status.current_status.start_time == started
+    assert status.current_status.progress == 90.0
+    assert status.current_status.details == "Separating stems"
+    assert len(status.history) == 1
+
+@pytest.mark.asyncio
+async def test_slot_pool_tracks_peak_and_utilisation():
+    pool = SlotPool(2)
+    with patch('cloud_splitter.utils.status.time.monotonic', side_effect=[0.0, 1.0, 3.0, 3.0, 4.0]):
+        pool._started = pool._changed = 0.0
+        async with pool:
+            await pool.__aenter__()
+            await pool.__aexit__(None, None, None)
+        stats = pool.stats
+
+    # One slot busy for 3s plus another for 2s, out of 2 slots over 4s
+    assert stats == {"capacity": 2, "in_use": 0, "peak": 2, "utilisation": 5 / 8}
@@ -0,0 +1,40 @@
+import pytest
+from unittest.mock import MagicMock
+from cloud_splitter.core.warmup import ModelWarmup, WarmupState
+
+def make_processor(warmup=True, error=None):
+    processor = MagicMock()
+    processor.config.demucs.model = "htdemucs"
+    processor.config.demucs.warmup = warmup
+    if error is not None:
+        processor.warm_up.side_effect = error
+    return processor
+
+@pytest.mark.asyncio
+async def test_warmup_reports_ready_after_model_runs():
+    processor = make_processor()
+    warmup = ModelWarmup(processor)
+    assert not warmup.ready
+    assert warmup.status["status"] == "pending"
+
+    warmup.start()
+    assert await warmup.wait()
+
+    processor.warm_up.assert_called_once()
+    assert warmup.state == WarmupState.READY
+    assert warmup.status["seconds"] is not None
+
+def test_failed_warmup_is_not_ready():
+    warmup = ModelWarmup(make_processor(error=RuntimeError("no weights")))
+
+    assert not warmup.run()
+    assert not warmup.ready
+    assert warmup.status == {"status": "failed", "model": "htdemucs", "seconds": None, "error": "no weights"}
+
+def test_disabled_warmup_is_ready_without_loading():
+    processor = make_processor(warmup=False)
+    warmup = ModelWarmup(processor)
+
+    assert warmup.ready
+    assert warmup.run()
+    processor.warm_up.assert_not_called()
@@ -1,20 +1,32 @@
 from typing import Dict
 from dataclasses import dataclass
 from pathlib import Path
+from unittest.mock import MagicMock
+import asyncio
 import pytest
+from cloud_splitter.config import Config
 from cloud_splitter.core.workflow import ProcessingWorkflow
-from cloud_splitter.core.config_loader import ConfigLoader
+from cloud_splitter.downloader import DownloadResult, PlaylistEntry
 from cloud_splitter.exceptions import ProcessingError
 
 @pytest.fixture
-def workflow(tmp_path):
-    """Create a test workflow with temporary directories"""
-    config = ConfigLoader.load_config()
+def config(tmp_path):
+    """Create a default configuration with temporary directories"""
+    config = Config()
     config.paths.download_dir = tmp_path / "downloads"
     config.paths.output_dir = tmp_path / "output"
+    config.paths.cache_dir = tmp_path / "cache"
+    config.demucs.warmup = False
+    return config
+
+@pytest.fixture
+def workflow(config):
+    """Create a test workflow with temporary directories"""
     config.download.keep_original = True
     config.processing.separator = "demucs"
-    return ProcessingWorkflow(config)
+    workflow = ProcessingWorkflow(config)
+    yield workflow
+    workflow.close()
 
 @pytest.mark.asyncio
 async def test_add_urls(workflow):
@@ -49,25 +61,21 @@ async def test_queue_processing(workflow):
     await workflow.add_urls(urls)
     
     # Mock processing to avoid actual downloads
-    @dataclass
-    class DownloadResult:
-        file_path: Path
-        title: str
-        artist: str
-    
     @dataclass
     class ProcessResult:
         output_dir: Path
         stems: Dict[str, Path]
+        skipped_seconds: float = 0.0
     
-    async def mock_download(url):
+    async def mock_download(url, progress=None):
         return DownloadResult(
             file_path=Path("test.wav"),
             title="Test Song",
-            artist="Test Artist"
+            artist="Test Artist",
+            is_video=False
         )
         
-    async def mock_process(file_path):
+    async def mock_process(file_path, progress=None):
         return ProcessResult(
             output_dir=Path("output"),
             stems={"vocals": Path("vocals.wav")}
@@ -82,3 +90,401 @@ async def test_queue_processing(workflow):
     assert len(results) == 2
     assert workflow.queue_status["complete"] == 2
     assert workflow.queue_status["pending"] == 0
+
+@pytest.mark.asyncio
+async def test_queue_processing_uses_processor_concurrency(workflow):
+    """Test that each separation worker gets its own queue consumer"""
+    await workflow.add_urls([f"https://www.youtube.com/watch?v=test{i}" for i in range(4)])
+
+    active = 0
+    peak = 0
+
+    async def mock_download_url(url):
+        return MagicMock(title="Test Song", artist="Test Artist")
+
+    async def mock_separate_download(url, download_result):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return MagicMock(stems={})
+
+    workflow.processor = MagicMock(concurrency=2)
+    workflow._download_url = mock_download_url
+    workflow._separate_download = mock_separate_download
+
+    results = await workflow.process_queue()
+
+    assert len(results) == 4
+    assert peak == 2
+    assert workflow.queue_status["complete"] == 4
+
+@pytest.mark.asyncio
+async def test_separation_progress_reaches_queue_and_status(workflow, tmp_path):
+    """Test that separation progress is published while the file is processed"""
+    url = "https://www.youtube.com/watch?v=test1"
+    await workflow.add_urls([url])
+    item = await workflow.queue.get_next_item()
+    seen = []
+
+    async def mock_download(url, progress=None):
+        return DownloadResult(file_path=tmp_path / "test.wav", title="Test Song", artist="Test Artist", is_video=False)
+
+    async def mock_process(file_path, progress=None):
+        progress(0.5)
+        await asyncio.sleep(0)
+        seen.append((item.progress, workflow.current_status["progress"]))
+        return MagicMock(output_dir=tmp_path / "output", stems={})
+
+    workflow.downloader.download = mock_download
+    workflow.processor.process_file = mock_process
+
+    await workflow.process_url(url)
+
+    assert seen == [(50.0, 50.0)]
+
+@pytest.mark.asyncio
+async def test_preview_and_full_separation_are_distinct_stages(config, tmp_path):
+    """Test that preview mode reports preview and processing stages separately"""
+    config.processing.preview = True
+    workflow = ProcessingWorkflow(config)
+    stems = {"vocals": tmp_path / "vocals.wav"}
+
+    async def mock_download(url, progress=None):
+        return DownloadResult(file_path=tmp_path / "test.wav", title="Test Song", artist="Test Artist", is_video=False)
+
+    async def mock_progressive(file_path, on_preview, progress=None):
+        on_preview(MagicMock(stems=stems))
+        return MagicMock(output_dir=tmp_path / "output", stems=stems)
+
+    workflow.downloader.download = mock_download
+    workflow.processor.process_progressive = mock_progressive
+
+    await workflow.process_url("https://www.youtube.com/watch?v=test1")
+
+    stages = [(s.stage, s.status) for s in workflow.status.history]
+    assert ("preview", "complete") in stages
+    assert stages[-1] == ("processing", "complete")
+
+@pytest.mark.asyncio
+async def test_encoding_overlaps_next_separation(config, tmp_path):
+    """Test that a finished track is encoded while the next one is separated"""
+    config.processing.output_format = "flac"
+    workflow = ProcessingWorkflow(config)
+    await workflow.add_urls([f"https://www.youtube.com/watch?v=test{i}" for i in range(2)])
+    events = []
+
+    async def mock_download_url(url):
+        return MagicMock(title="Test Song", artist="Test Artist")
+
+    async def mock_separate_download(url, download_result):
+        events.append(("separate", url[-1]))
+        await asyncio.sleep(0.01)
+        return MagicMock(stems={}, input_file=url)
+
+    async def mock_encode(result):
+        events.append(("encode start", result.input_file[-1]))
+        await asyncio.sleep(0.05)
+        events.append(("encode end", result.input_file[-1]))
+        return MagicMock(output_dir=tmp_path / "output", stems={"vocals": tmp_path / "vocals.flac"})
+
+    workflow._download_url = mock_download_url
+    workflow._separate_download = mock_separate_download
+    workflow.encoder.encode = mock_encode
+
+    results = await workflow.process_queue()
+
+    assert len(results) == 2
+    assert all(result["stems"]["vocals"].suffix == ".flac" for result in results)
+    assert events.index(("separate", "1")) < events.index(("encode end", "0"))
+    assert workflow.queue_status["complete"] == 2
+
+@pytest.mark.asyncio
+async def test_interrupted_item_reuses_download_on_retry(workflow, tmp_path):
+    """Test that a retried URL resumes from its earlier download"""
+    url = "https://www.youtube.com/watch?v=test1"
+    downloaded = tmp_path / "test.wav"
+    downloaded.write_bytes(b"audio")
+    downloads = []
+    separated = []
+
+    async def mock_download(url, progress=None):
+        downloads.append(url)
+        return DownloadResult(file_path=downloaded, title="Test Song", artist="Test Artist", is_video=False)
+
+    async def crashing_process(file_path, progress=None):
+        raise RuntimeError("worker died")
+
+    async def mock_process(file_path, progress=None):
+        separated.append(file_path)
+        return MagicMock(output_dir=tmp_path / "output", stems={}, skipped_seconds=0.0)
+
+    workflow.downloader.download = mock_download
+    workflow.processor.process_file = crashing_process
+    with pytest.raises(ProcessingError):
+        await workflow.process_url(url)
+
+    workflow.processor.process_file = mock_process
+    result = await workflow.process_url(url)
+
+    assert downloads == [url]
+    assert separated == [downloaded]
+    assert result["title"] == "Test Song"
+    assert workflow.resume_index.get(url) is None
+
+@pytest.mark.asyncio
+async def test_pipeline_overlaps_downloads_with_backpressure(config):
+    """Test that downloads overlap separation but stop when separation falls behind"""
+    config.download.concurrent_downloads = 2
+    config.processing.pipeline_buffer = 1
+    workflow = ProcessingWorkflow(config)
+    await workflow.add_urls([f"https://www.youtube.com/watch?v=test{i}" for i in range(8)])
+    downloaded = []
+    separated = []
+    ahead = []
+
+    async def mock_download_url(url):
+        downloaded.append(url)
+        ahead.append(len(downloaded) - len(separated))
+        return MagicMock(title="Test Song", artist="Test Artist")
+
+    async def mock_separate_download(url, download_result):
+        if url.endswith("0"):
+            # The next downloads finish while the first track is separated
+            await asyncio.sleep(0.05)
+            assert len(downloaded) > 1
+        await asyncio.sleep(0.01)
+        separated.append(url)
+        return MagicMock(stems={}, skipped_seconds=0.0)
+
+    workflow.processor = MagicMock(concurrency=1)
+    workflow._download_url = mock_download_url
+    workflow._separate_download = mock_separate_download
+
+    results = await workflow.process_queue()
+
+    assert len(results) == 8
+    assert separated == downloaded
+    # One being separated, one buffered, one per blocked downloader, one starting
+    assert max(ahead) <= 1 + 1 + 2 + 1
+    assert workflow.queue_status["complete"] == 8
+
+@pytest.mark.asyncio
+async def test_playlist_urls_are_queued_per_entry(workflow):
+    """Test that each playlist entry becomes its own queue item"""
+    playlist = "https://www.youtube.com/playlist?list=PL1"
+    broken = "https://www.youtube.com/playlist?list=gone"
+
+    async def mock_expand(url):
+        if url == broken:
+            raise RuntimeError("Playlist expansion failed: HTTP Error 404")
+        return [
+            PlaylistEntry(url=f"https://www.youtube.com/watch?v={i}", title=f"Track {i}", playlist="Live", index=i)
+            for i in (1, 2)
+        ]
+
+    workflow.downloader.expand = mock_expand
+    items = await workflow.add_urls([playlist, broken])
+
+    assert [item.url for item in items] == [
+        "https://www.youtube.com/watch?v=1",
+        "https://www.youtube.com/watch?v=2",
+        broken
+    ]
+    assert items[1].metadata == {"title": "Track 2", "playlist": "Live", "index": 2}
+    assert workflow.queue_status["pending"] == 3
+
+@pytest.mark.asyncio
+async def test_download_progress_reaches_queue_and_status(workflow, tmp_path):
+    """Test that download progress, speed and ETA are published per item"""
+    url = "https://www.youtube.com/watch?v=test1"
+    item, = await workflow.add_urls([url])
+    seen = []
+
+    async def mock_download(url, progress=None):
+        progress(0.25, speed=3 * 1024 * 1024, eta=75, details="Downloading")
+        await asyncio.sleep(0)
+        seen.append((item.progress, item.speed, item.eta, workflow.current_status["details"]))
+        return DownloadResult(file_path=tmp_path / "test.wav", title="Test Song", artist="Test Artist", is_video=False)
+
+    workflow.downloader.download = mock_download
+    await workflow._download_url(url)
+
+    assert seen == [(25.0, 3 * 1024 * 1024, 75, "Downloading at 3.0 MiB/s, 1:15 left")]
+    # Ticks update the download stage without adding to its history
+    assert [s.stage for s in workflow.status.history] == ["download"]
+
+@pytest.mark.asyncio
+async def test_shortest_job_first_runs_short_tracks_first(config):
+    """Test that prefetched durations let short tracks overtake a long one"""
+    config.processing.schedule = "sjf"
+    workflow = ProcessingWorkflow(config)
+    durations = {"live-set": 3 * 3600, "song-a": 200, "song-b": 180}
+    probed = []
+
+    async def mock_probe(url):
+        probed.append(url)
+        return {"duration": durations[url.rsplit("=", 1)[1]]}
+
+    workflow.downloader.probe = mock_probe
+    urls = [f"https://www.youtube.com/watch?v={name}" for name in durations]
+    await workflow.add_urls(urls)
+    await asyncio.gather(*list(workflow._prefetch_tasks))
+
+    assert sorted(probed) == sorted(urls)
+    order = [(await workflow.queue.get_next_item()).url.rsplit("=", 1)[1] for _ in urls]
+    assert order == ["song-b", "song-a", "live-set"]
+
+@pytest.mark.asyncio
+async def test_priority_schedule_orders_by_added_priority(config):
+    """Test that add_urls passes priority through and nothing is probed for it"""
+    config.processing.schedule = "priority"
+    config.download.expand_playlists = False
+    workflow = ProcessingWorkflow(config)
+    workflow.downloader.probe = MagicMock(side_effect=AssertionError("probed"))
+
+    await workflow.add_urls(["https://www.youtube.com/watch?v=later"])
+    await workflow.add_urls(["https://www.youtube.com/watch?v=urgent"], priority=10)
+
+    assert not workflow._prefetch_tasks
+    order = [(await workflow.queue.get_next_item()).url.rsplit("=", 1)[1] for _ in range(2)]
+    assert order == ["urgent", "later"]
+    workflow.close()
+
+@pytest.mark.asyncio
+async def test_metadata_probes_use_the_metadata_slots(config):
+    """Test that background probes are bounded by prefetch_workers and reported"""
+    config.processing.schedule = "sjf"
+    config.download.prefetch_workers = 2
+    workflow = ProcessingWorkflow(config)
+
+    async def mock_probe(url):
+        await asyncio.sleep(0.01)
+        return {"duration": 200}
+
+    workflow.downloader.probe = mock_probe
+    await workflow.add_urls([f"https://www.youtube.com/watch?v=test{i}" for i in range(5)])
+    await asyncio.gather(*list(workflow._prefetch_tasks))
+
+    assert workflow.worker_status["slots"]["metadata"]["peak"] == 2
+    workflow.close()
+
+@pytest.mark.asyncio
+async def test_queue_workers_share_download_and_separation_slots(config):
+    """Test that workers overlap downloads within their slot limits and report utilisation"""
+    config.download.concurrent_downloads = 2
+    workflow = ProcessingWorkflow(config)
+    await workflow.add_urls([f"https://www.youtube.com/watch?v=test{i}" for i in range(6)])
+    downloading = 0
+    peak_downloads = 0
+    depths = []
+
+    async def mock_download_url(url):
+        nonlocal downloading, peak_downloads
+        downloading += 1
+        peak_downloads = max(peak_downloads, downloading)
+        await asyncio.sleep(0.01)
+        downloading -= 1
+        return MagicMock(title="Test Song", artist="Test Artist")
+
+    async def mock_separate_download(url, download_result):
+        depths.append(workflow.worker_status["queue_depth"])
+        await asyncio.sleep(0.02)
+        return MagicMock(stems={}, skipped_seconds=0.0)
+
+    workflow.processor = MagicMock(concurrency=1)
+    workflow._download_url = mock_download_url
+    workflow._separate_download = mock_separate_download
+
+    results = await workflow.process_queue(concurrency=4)
+
+    status = workflow.worker_status
+    assert len(results) == 6
+    assert status["workers"] == 4
+    assert peak_downloads == 2
+    assert status["slots"]["download"]["peak"] == 2
+    assert status["slots"]["separation"]["peak"] == 1
+    assert status["slots"]["encode"]["peak"] >= 1
+    # The single separation slot is the bottleneck and stays busy
+    assert status["slots"]["separation"]["utilisation"] > 0.5
+    assert depths[0] == 2 and status["queue_depth"] == 0
+
+@pytest.mark.asyncio
+async def test_process_queue_warms_the_workflow_processor(config):
+    """Test that the queue warms up the processor that will separate its items"""
+    config.demucs.warmup = True
+    workflow = ProcessingWorkflow(config)
+    workflow.processor.warm_up = MagicMock()
+
+    await workflow.process_queue()
+    await workflow.process_queue()
+
+    workflow.processor.warm_up.assert_called_once()
+    assert workflow.warmup.ready
+
+@pytest.mark.asyncio
+async def test_waiting_downloads_are_separated_in_batches(config):
+    """Test that downloads queued behind a busy separator share one process_batch call"""
+    config.processing.batch_tracks = 3
+    config.processing.pipeline_buffer = 4
+    workflow = ProcessingWorkflow(config)
+    urls = [f"https://www.youtube.com/watch?v=test{i}" for i in range(6)]
+    await workflow.add_urls(urls)
+    batches = []
+
+    async def mock_download_url(url):
+        return MagicMock(file_path=Path(url[-5:]), title="Test Song", artist="Test Artist")
+
+    async def mock_process_batch(input_files, progress=None):
+        batches.append([path.name for path in input_files])
+        progress(1.0)
+        await asyncio.sleep(0.01)
+        return [MagicMock(stems={}, skipped_seconds=0.0, input_file=path) for path in input_files]
+
+    async def mock_process_file(input_file, progress=None):
+        return (await mock_process_batch([input_file], progress))[0]
+
+    workflow.processor = MagicMock(concurrency=1)
+    workflow.processor.process_batch = mock_process_batch
+    workflow.processor.process_file = mock_process_file
+    workflow._download_url = mock_download_url
+
+    results = await workflow.process_queue()
+
+    assert len(results) == 6
+    assert [name for batch in batches for name in batch] == [url[-5:] for url in urls]
+    assert max(len(batch) for batch in batches) == 3
+    assert workflow.queue_status["complete"] == 6
+
+@pytest.mark.asyncio
+async def test_batched_separation_with_several_slots_finishes(config):
+    """Test that workers whose downloads joined another batch wait for it instead of separating again"""
+    config.processing.batch_tracks = 2
+    workflow = ProcessingWorkflow(config)
+    await workflow.add_urls([f"https://www.youtube.com/watch?v=test{i}" for i in range(6)])
+    batches = []
+
+    async def mock_download_url(url):
+        # Downloads arrive in pairs, the later ones while both slots are busy
+        await asyncio.sleep(0.01 * (int(url[-1]) // 2))
+        return MagicMock(file_path=Path(url[-5:]), title="Test Song", artist="Test Artist")
+
+    async def mock_process_batch(input_files, progress=None):
+        batches.append(len(input_files))
+        await asyncio.sleep(0.03)
+        return [MagicMock(stems={}, skipped_seconds=0.0) for _ in input_files]
+
+    async def mock_process_file(input_file, progress=None):
+        return (await mock_process_batch([input_file], progress))[0]
+
+    workflow.processor = MagicMock(concurrency=2)
+    workflow.processor.process_batch = mock_process_batch
+    workflow.processor.process_file = mock_process_file
+    workflow._download_url = mock_download_url
+
+    results = await asyncio.wait_for(workflow.process_queue(concurrency=4), timeout=5)
+
+    assert len(results) == 6
+    assert 0 not in batches
+    assert sum(batches) == 6 and max(batches) == 2
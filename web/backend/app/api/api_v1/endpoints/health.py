@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from app.core.database import get_db, database
+from app.services.model_warmup import model_warmup
 
 router = APIRouter()
 
@@ -32,12 +34,17 @@ def readiness_check(db: Session = Depends(get_db)):
     """
     Readiness check to verify all components are operational
     """
-    return {
-        "status": "ready",
-        "components": {
-            "api": "operational",
-            "database": "operational",
-            "file_system": "operational"
+    ready = model_warmup.ready
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else model_warmup.status["status"],
+            "components": {
+                "api": "operational",
+                "database": "operational",
+                "file_system": "operational",
+                "separation_model": model_warmup.status
+            }
         }
-    }
+    )
 
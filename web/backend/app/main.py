@@ -6,6 +6,7 @@ from starlette.middleware.sessions import SessionMiddleware
 from app.core.config import settings
 from app.core.database import database
 from app.api.api_v1.api import api_router
+from app.services.model_warmup import model_warmup
 
 def create_application() -> FastAPI:
     application = FastAPI(
@@ -49,11 +50,15 @@ async def startup():
     settings.UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
     # Connect to database
     await database.connect()
+    # Load and warm the separation model; /health/ready waits for it
+    model_warmup.start()
 
 @app.on_event("shutdown")
 async def shutdown():
     # Disconnect from database
     await database.disconnect()
+    # Stop the separation worker processes
+    model_warmup.close()
 
 if __name__ == "__main__":
     import uvicorn
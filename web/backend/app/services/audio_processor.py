@@ -70,7 +70,7 @@ import uuid
 from pathlib import Path
 import librosa
 import numpy as np
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from sqlalchemy.orm import Session
 import asyncio
 from pydub import AudioSegment
@@ -81,6 +81,31 @@ from app.core.config import settings
 from app.schemas.audio import AudioMetadata, ProcessingStatus
 from app.models.audio import AudioFile, ProcessingTask, AudioMetadata as AudioMetadataModel, ProcessingResult
 
+try:
+    from cloud_splitter.core.config_loader import ConfigLoader
+    from cloud_splitter.utils.audio import load_decoded
+    from cloud_splitter.utils.cache import DecodedAudioCache
+except ImportError:
+    # The web service can run without the cloud-splitter package installed
+    DecodedAudioCache = None
+
+# Matches the separation models, so analysis shares their decoded audio
+DECODED_SAMPLE_RATE = 44100
+# librosa's default rate, which the tempo and spectral features are computed at
+ANALYSIS_SAMPLE_RATE = 22050
+
+def _create_decoded_cache() -> Optional["DecodedAudioCache"]:
+    """
+    Open the configured decoded-audio cache, or None when it is disabled
+    """
+    config = ConfigLoader.load_or_default()
+    if not (config.cache.enabled and config.cache.decoded_audio):
+        return None
+    return DecodedAudioCache(config.paths.cache_dir / "decoded", config.cache.decoded_max_size)
+
+# Opened once: the cache scans its directory when created
+decoded_cache = _create_decoded_cache() if DecodedAudioCache is not None else None
+
 class AudioProcessor:
     def __init__(self, file_path: Path, db: Session):
         self.file_path = file_path
@@ -104,7 +129,7 @@ class AudioProcessor:
             await self._update_status("processing")
         try:
             # Load audio file
-            y, sr = librosa.load(str(self.file_path))
+            y, sr = self._load_audio()
             
             # Extract metadata
             metadata = self._extract_metadata(y, sr)
@@ -125,6 +150,17 @@ class AudioProcessor:
             await self._update_status("failed", str(e))
             raise
 
+    def _load_audio(self) -> Tuple[np.ndarray, int]:
+        """
+        Load mono audio at the analysis rate, resampled from the shared
+        decoded-audio cache when available
+        """
+        if DecodedAudioCache is None:
+            return librosa.load(str(self.file_path), sr=ANALYSIS_SAMPLE_RATE)
+        audio = load_decoded(self.file_path, DECODED_SAMPLE_RATE, 2, decoded_cache)
+        mono = librosa.resample(audio.mean(axis=1), orig_sr=DECODED_SAMPLE_RATE, target_sr=ANALYSIS_SAMPLE_RATE)
+        return mono, ANALYSIS_SAMPLE_RATE
+
     def _extract_metadata(self, y: np.ndarray, sr: int) -> AudioMetadata:
         """
         Extract audio metadata including tempo, key, and spectral features
@@ -0,0 +1,62 @@
+from typing import Any, Dict, Optional
+
+try:
+    from cloud_splitter.core.config_loader import ConfigLoader
+    from cloud_splitter.core.processor_factory import ProcessorFactory
+    from cloud_splitter.core.warmup import ModelWarmup
+except ImportError:
+    # The web service can run without the cloud-splitter package installed
+    ModelWarmup = None
+
+class ModelWarmupService:
+    """
+    Warms the separation model at startup and reports its readiness
+    """
+    def __init__(self):
+        self.warmup: Optional["ModelWarmup"] = None
+        # Why the configured settings or the warm-up could not be used
+        self.errors: Dict[str, str] = {}
+
+    def start(self) -> None:
+        """
+        Start warming the configured model in the background.
+        Failures are recorded in the status rather than stopping the app.
+        """
+        if ModelWarmup is None:
+            return
+        config = ConfigLoader.load_or_default(on_error=self._config_failed)
+        try:
+            self.warmup = ModelWarmup(ProcessorFactory.create_processor(config))
+            self.warmup.start()
+        except Exception as e:
+            self.errors["warmup"] = str(e)
+
+    def _config_failed(self, error: Exception) -> None:
+        self.errors["config"] = str(error)
+
+    def close(self) -> None:
+        """
+        Release the warmed processor and its worker processes
+        """
+        if self.warmup is not None:
+            self.warmup.processor.close()
+
+    @property
+    def ready(self) -> bool:
+        if "warmup" in self.errors:
+            return False
+        return self.warmup is None or self.warmup.ready
+
+    @property
+    def status(self) -> Dict[str, Any]:
+        if "warmup" in self.errors:
+            return {"status": "failed", "error": self.errors["warmup"], **self._config_error}
+        if self.warmup is None:
+            return {"status": "unavailable"}
+        return {**self.warmup.status, **self._config_error}
+
+    @property
+    def _config_error(self) -> Dict[str, str]:
+        return {"config_error": self.errors["config"]} if "config" in self.errors else {}
+
+model_warmup = ModelWarmupService()